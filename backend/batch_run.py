@@ -0,0 +1,261 @@
+# Offline batch runner: scores a file of claims/URLs through the VeriAI pipeline without the Flask server.
+#
+#   python batch_run.py claims.jsonl -o results.jsonl --workers 8
+#   python batch_run.py claims.jsonl -o results.jsonl --record recorded.jsonl     # live, saving responses
+#   python batch_run.py claims.jsonl -o rescored.jsonl --providers replay --replay recorded.jsonl --db nightly.db
+#
+# Input is JSONL, a JSON array, or plain text with one claim/URL per line. Each
+# entry is a string or an object with article_text or article_url (plus optional
+# id and force_refresh), as for /api/analyze_batch. Output is one JSONL line per unique
+# entry; re-running with the same output file skips entries already written
+# (keyed by text_hash, or by URL for URL entries), so an interrupted run resumes.
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import vri
+from db import Database
+
+# --- Offline Providers ---
+STUB_RESPONSES = {
+    'extract': {"status": "not_found", "message": "Offline stub: no article fetched."},
+    'fact_check': {"status": "success", "found": False, "rating": "Not Found", "publisher": "N/A"},
+    'gemini': {"status": "error", "message": "Offline stub: Gemini not called."},
+}
+
+def _digest(*parts):
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+def provider_keys():
+    """Functions mapping each provider's arguments to its recording key."""
+    return {
+        'extract': lambda url: vri.canonical_url(url),
+        'fact_check': lambda text, is_url_content=False: _digest(text, bool(is_url_content)),
+        'gemini': lambda text, text_hash=None, force_refresh=False: text_hash or _digest(text),
+    }
+
+class ResponseRecording:
+    """
+    Upstream responses stored as JSONL lines {"provider", "key", "response"}.
+    Used both to record a live run and to replay it offline.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.responses = {}
+        self.replayed = 0
+        self.missed = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.responses[(entry['provider'], entry['key'])] = entry['response']
+
+    def replaying(self, name, key_fn):
+        """A provider that answers from the recording, falling back to the stub response."""
+        def provider(*args, **kwargs):
+            response = self.responses.get((name, key_fn(*args, **kwargs)))
+            with self._lock:
+                if response is None:
+                    self.missed += 1
+                else:
+                    self.replayed += 1
+            return dict(response if response is not None else STUB_RESPONSES[name])
+        return provider
+
+    def recording(self, name, key_fn, live):
+        """Wraps a live provider so each successful response is appended to the recording."""
+        def provider(*args, **kwargs):
+            response = live(*args, **kwargs)
+            if response.get('status') == 'success':
+                line = json.dumps({"provider": name, "key": key_fn(*args, **kwargs), "response": response})
+                with self._lock:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(line + '\n')
+            return response
+        return provider
+
+def install_providers(mode, replay_path=None, record_path=None):
+    """Plugs the chosen upstream providers into the pipeline.
+
+    Returns:
+        The ResponseRecording in use, or None.
+    """
+    keys = provider_keys()
+    if mode == 'stub':
+        vri.set_upstream_providers(**{name: (lambda name: lambda *a, **k: dict(STUB_RESPONSES[name]))(name)
+                                      for name in STUB_RESPONSES})
+        return None
+    if mode == 'replay':
+        recording = ResponseRecording(replay_path)
+        vri.set_upstream_providers(**{name: recording.replaying(name, keys[name]) for name in keys})
+        print(f"[Batch] Replaying {len(recording.responses)} recorded responses from {replay_path}", file=sys.stderr)
+        return recording
+    if record_path:
+        recording = ResponseRecording(record_path)
+        vri.set_upstream_providers(**{name: recording.recording(name, keys[name], vri.UPSTREAM_PROVIDERS[name])
+                                      for name in keys})
+        return recording
+    return None
+
+# --- Input / Progress ---
+def read_entries(path):
+    """Reads JSONL, a JSON array, or plain lines (one claim/URL each)."""
+    with open(path, encoding='utf-8') as f:
+        raw = f.read()
+    try:
+        return vri.parse_batch_body(raw)
+    except ValueError:
+        return [line.strip() for line in raw.splitlines() if line.strip()]
+
+def entry_key(text, url):
+    """Progress key: the text_hash for text entries, the canonical URL for URL entries."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest() if text else url
+
+def completed_keys(output_path):
+    """Keys (and text hashes) of entries already written to the output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue # A line cut short by an interrupted run
+            if row.get('status') == 'done':
+                done.add(row.get('key'))
+                done.add((row.get('result') or {}).get('text_hash'))
+    done.discard(None)
+    return done
+
+# --- Pipeline ---
+def run_entry(text, url, force_refresh=False):
+    """Runs one entry through extraction (for URLs) and analysis, retrying rate limits in place."""
+    if url:
+        extracted = vri.UPSTREAM_PROVIDERS['extract'](url)
+        for _ in range(vri.RATE_LIMIT_MAX_REQUEUES):
+            if extracted.get('status') != 'rate_limited':
+                break
+            time.sleep(min(max(extracted.get('retry_after') or 1.0, 1.0), vri.RATE_LIMIT_MAX_DELAY))
+            extracted = vri.UPSTREAM_PROVIDERS['extract'](url)
+        text = extracted.get('content') if extracted.get('status') == 'success' else None
+        if not text:
+            return {"status": "failed", "error": extracted.get('message', 'Failed to extract URL content')}
+    text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    reuse = None
+    for attempt in range(vri.RATE_LIMIT_MAX_REQUEUES + 1):
+        outcome = vri.analyze_text(text, text_hash, url, reuse=reuse, force_refresh=force_refresh,
+                                   retry_limited=attempt < vri.RATE_LIMIT_MAX_REQUEUES)
+        if outcome['status'] != 'rate_limited':
+            return outcome
+        reuse = outcome['partial']
+        time.sleep(min(max(outcome['retry_after'], 1.0), vri.RATE_LIMIT_MAX_DELAY))
+    return outcome
+
+def _percentile(ordered, pct):
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))], 1) if ordered else None
+
+def run_batch(entries, output_path, workers=4, resume=True):
+    """Scores entries concurrently, appending one JSONL line per entry to output_path.
+
+    Returns:
+        The summary dict.
+    """
+    done_keys = completed_keys(output_path) if resume else set()
+    todo = {} # key -> (first index, text, url, client id, force_refresh)
+    summary = {"total": len(entries), "invalid": 0, "resumed": 0, "duplicates": 0, "done": 0, "failed": 0, "verdicts": {}}
+    for index, entry in enumerate(entries):
+        text, url, client_id, force_refresh = vri.parse_batch_entry(entry)
+        if not text and not url:
+            summary['invalid'] += 1
+            continue
+        key = entry_key(text, url)
+        if key in done_keys:
+            summary['resumed'] += 1
+        elif key in todo:
+            summary['duplicates'] += 1
+        else:
+            todo[key] = (index, text, url, client_id, force_refresh)
+    print(f"[Batch] {len(todo)} to score ({summary['resumed']} already done, {summary['duplicates']} duplicates, "
+          f"{summary['invalid']} invalid) with {workers} workers", file=sys.stderr)
+
+    latencies = []; lock = threading.Lock()
+    start = time.monotonic()
+
+    def score(key, index, text, url, client_id, force_refresh):
+        t0 = time.monotonic()
+        try:
+            outcome = run_entry(text, url, force_refresh)
+        except Exception as e:
+            outcome = {"status": "failed", "error": str(e)}
+        return dict(outcome, key=key, index=index, id=client_id, latency_ms=round((time.monotonic() - t0) * 1000, 1))
+
+    with open(output_path, 'a' if resume else 'w', encoding='utf-8') as out, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix='Batch') as pool:
+        futures = [pool.submit(score, key, *item) for key, item in todo.items()]
+        for future in as_completed(futures):
+            row = future.result()
+            with lock:
+                out.write(json.dumps(row) + '\n'); out.flush() # Flushed per line so an interrupted run can resume
+                latencies.append(row['latency_ms'])
+                if row['status'] == 'done':
+                    summary['done'] += 1
+                    verdict = row['result']['final_verdict']
+                    summary['verdicts'][verdict] = summary['verdicts'].get(verdict, 0) + 1
+                else:
+                    summary['failed'] += 1
+
+    elapsed = time.monotonic() - start
+    latencies.sort()
+    summary.update(
+        elapsed_s=round(elapsed, 2),
+        throughput_per_s=round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        latency_ms={"avg": round(sum(latencies) / len(latencies), 1) if latencies else None,
+                    "p50": _percentile(latencies, 0.50), "p95": _percentile(latencies, 0.95),
+                    "max": latencies[-1] if latencies else None})
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a file of claims/URLs through the VeriAI pipeline offline.")
+    parser.add_argument('input', help="JSONL, JSON array, or one claim/URL per line")
+    parser.add_argument('-o', '--output', default='batch_results.jsonl', help="JSONL results file (appended to on resume)")
+    parser.add_argument('-w', '--workers', type=int, default=vri.WORKER_COUNT, help="Entries scored concurrently")
+    parser.add_argument('--providers', choices=('live', 'stub', 'replay'), default='live',
+                        help="live: real APIs; stub: canned no-signal responses; replay: answers from --replay")
+    parser.add_argument('--replay', help="Recorded responses to replay (with --providers replay)")
+    parser.add_argument('--record', help="Append successful live responses here for later replay")
+    parser.add_argument('--db', help="SQLite file to save results to (default: the server's vri.db)")
+    parser.add_argument('--no-resume', action='store_true', help="Overwrite the output file instead of resuming")
+    args = parser.parse_args(argv)
+    if args.providers == 'replay' and not args.replay:
+        parser.error("--providers replay needs --replay FILE")
+
+    if args.db:
+        vri.DB_FILE = args.db; vri.DB = Database(args.db)
+    vri.init_database()
+    vri.load_seen_index() # already_analyzed() answers from it, e.g. to skip the near-duplicate lookup
+    vri.start_near_dup_backfill()
+    recording = install_providers(args.providers, args.replay, args.record)
+    vri.start_result_writer()
+    try:
+        summary = run_batch(read_entries(args.input), args.output, workers=max(1, args.workers), resume=not args.no_resume)
+    finally:
+        vri.stop_result_writer()
+        vri.UPSTREAM_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        vri.EXTRACT_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        vri.UPSTREAM.close()
+        vri.seen_index.close()
+    if recording is not None and args.providers == 'replay':
+        summary['replay'] = {"replayed": recording.replayed, "missed": recording.missed}
+    print(json.dumps(summary, indent=2))
+    return 0 if not summary['failed'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# backend/batching.py
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# --- Micro-Batcher ---
+class MicroBatcher:
+    """
+    Collects individual requests arriving from many threads into small
+    batches so one upstream round trip can serve several callers.
+    A batch is sent once max_batch items are waiting or window seconds
+    have passed since the first one arrived. If the batch call fails or
+    returns something malformed, every item falls back to single_fn.
+    """
+    def __init__(self, batch_fn, single_fn, max_batch=8, window=0.05, max_concurrent=2, name='Batcher'):
+        """
+        Args:
+            batch_fn: Callable(list of items) -> list of results, same length and order.
+                      Should raise (e.g. ValueError) if the response is unusable.
+            single_fn: Callable(item) -> result, used for fallbacks.
+            max_batch: Most items sent in one call.
+            window: Seconds to wait for more items after the first one arrives.
+            max_concurrent: Batches allowed in flight at the same time.
+        """
+        self.batch_fn = batch_fn
+        self.single_fn = single_fn
+        self.max_batch = max(1, max_batch)
+        self.window = window
+        self.name = name
+        self._pending = deque() # (item, Future)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix=name)
+        self.batches = 0
+        self.batched_items = 0
+        self.fallbacks = 0
+        self._thread = threading.Thread(target=self._collect, name=f"{name}-Collector", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queues one item and returns a Future for its result."""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed.")
+            self._pending.append((item, future))
+            self._cond.notify()
+        return future
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                # Give other callers a short window to join this batch
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        break
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        items = [item for item, _ in batch]
+        if len(items) > 1:
+            try:
+                results = self.batch_fn(items)
+                if not isinstance(results, list) or len(results) != len(items):
+                    raise ValueError(f"expected {len(items)} results, got {len(results) if isinstance(results, list) else type(results).__name__}")
+                with self._cond:
+                    self.batches += 1; self.batched_items += len(items)
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+                return
+            except Exception as e:
+                with self._cond:
+                    self.fallbacks += 1
+                print(f"[{self.name}] Batch of {len(items)} unusable ({e}); falling back to single calls.")
+        for item, future in batch:
+            try:
+                future.set_result(self.single_fn(item))
+            except Exception as e:
+                future.set_exception(e)
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._pending)
+        return {"batches": self.batches, "batched_items": self.batched_items,
+                "fallbacks": self.fallbacks, "pending": pending, "max_batch": self.max_batch}
+
+    def close(self):
+        """Sends whatever is pending, then stops the collector thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
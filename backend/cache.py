@@ -0,0 +1,269 @@
+# backend/cache.py
+import json
+import sqlite3
+import threading
+import time
+
+from db import Database
+from dsa import TTLCache
+
+# --- Persistent Cache Tier ---
+class SQLiteCacheTier:
+    """
+    A small key/value table in SQLite that outlives the process.
+    Values are stored as JSON with an absolute expiry time; expired rows
+    are ignored on read and pruned periodically on write.
+    """
+    PRUNE_EVERY = 500 # Writes between expired-row sweeps
+
+    def __init__(self, db_path, table):
+        self.db_path = db_path
+        self.table = table
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.db = Database(db_path)
+        with self.db.transaction() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, key):
+        """Returns (value, expires_at) or None if missing/expired."""
+        row = self.db.connect().execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ? AND expires_at > ?",
+                                        (key, time.time())).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def set(self, key, value, expires_at):
+        with self.db.transaction() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, json.dumps(value), expires_at))
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % self.PRUNE_EVERY == 0
+            if prune:
+                conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+
+    def clear(self):
+        with self.db.transaction() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+# --- Two-Tier Cache ---
+class TieredCache:
+    """
+    An in-memory TTL/LRU cache backed by an optional SQLite tier.
+    Reads check memory first, then SQLite (promoting hits back into memory);
+    writes go to both.
+    """
+    def __init__(self, name, max_size, ttl, db_path=None):
+        self.name = name
+        self.ttl = ttl
+        self.memory = TTLCache(max_size=max_size, ttl=ttl)
+        self.persistent = SQLiteCacheTier(db_path, f"{name}_cache") if db_path else None
+        self._lock = threading.Lock()
+        self.persistent_hits = 0
+
+    def get(self, key):
+        """Returns the cached value for key, or None."""
+        value = self.memory.get(key)
+        if value is None and self.persistent is not None:
+            try:
+                row = self.persistent.get(key)
+            except sqlite3.Error as e:
+                print(f"[Cache] Persistent {self.name} lookup failed: {e}")
+                row = None
+            if row is not None:
+                value, expires_at = row
+                self.memory.set(key, value, ttl=expires_at - time.time()) # Promote to memory
+                with self._lock:
+                    self.persistent_hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.memory.set(key, value, ttl=ttl)
+        if self.persistent is not None:
+            try:
+                self.persistent.set(key, value, time.time() + ttl)
+            except sqlite3.Error as e:
+                print(f"[Cache] Persistent {self.name} write failed: {e}")
+
+    def clear(self):
+        self.memory.clear()
+        if self.persistent is not None:
+            self.persistent.clear()
+
+    def stats(self):
+        stats = self.memory.stats()
+        with self._lock:
+            stats.update(persistent_hits=self.persistent_hits, persistent=self.persistent is not None)
+        return stats
+
+# --- Fact Check Response Cache ---
+class FactCheckCache(TieredCache):
+    """
+    Caches Fact Check API results by normalized query.
+    Positive results live for ttl seconds, "Not Found" results for the
+    (usually shorter) negative_ttl; errors are never cached.
+    """
+    def __init__(self, max_size=2048, ttl=6 * 3600, negative_ttl=1800, db_path=None):
+        super().__init__('fact_check', max_size, ttl, db_path)
+        self.negative_ttl = negative_ttl
+        self.negative_hits = 0
+
+    @staticmethod
+    def _is_negative(result):
+        return not result.get('found') and result.get('rating') == 'Not Found'
+
+    def get(self, key):
+        result = super().get(key)
+        if result is not None and self._is_negative(result):
+            with self._lock:
+                self.negative_hits += 1
+        return result
+
+    def put(self, key, result):
+        """Caches a successful result; anything else (errors, rate limits) is skipped."""
+        if result.get('status') != 'success':
+            return
+        self.set(key, result, ttl=self.negative_ttl if self._is_negative(result) else self.ttl)
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats['negative_hits'] = self.negative_hits
+        return stats
+
+# --- Gemini Verdict Cache ---
+class GeminiCache(TieredCache):
+    """
+    Content-addressed cache of Gemini's structured verdicts.
+    Keys combine the text hash with the model name and prompt version, so
+    changing either naturally misses. Entries older than max_age are stale
+    and are never served.
+    """
+    def __init__(self, max_size=4096, max_age=7 * 24 * 3600, db_path=None):
+        super().__init__('gemini', max_size, max_age, db_path)
+        self.stale_skips = 0
+
+    @staticmethod
+    def make_key(text_hash, model, prompt_version):
+        return f"{text_hash}:{model}:v{prompt_version}"
+
+    def get(self, key, max_age=None):
+        """
+        Returns {"data": ..., "cached_at": ...} or None.
+
+        Args:
+            max_age: Optional stricter age limit (seconds) for this lookup.
+        """
+        entry = super().get(key)
+        if entry is not None and max_age is not None and time.time() - entry['cached_at'] > max_age:
+            with self._lock:
+                self.stale_skips += 1
+            return None
+        return entry
+
+    def put(self, key, data):
+        self.set(key, {"data": data, "cached_at": time.time()})
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats.update(stale_skips=self.stale_skips, max_age=self.ttl)
+        return stats
+
+# --- Extracted Article Cache ---
+class ArticleCache:
+    """
+    On-disk cache of extracted article text keyed by canonical URL.
+    Each entry keeps the page's ETag/Last-Modified so a stale copy can be
+    revalidated with a conditional GET instead of re-downloaded. Entries
+    younger than freshness seconds are served without any network call.
+    Total stored bytes stay under max_bytes by evicting the least recently
+    used entries.
+    """
+    EVICT_BATCH = 32
+
+    def __init__(self, db_path, max_bytes=32 * 1024 * 1024, freshness=3600):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.freshness = freshness
+        self._lock = threading.Lock()
+        self.hits = 0 # Served fresh, no network
+        self.revalidated = 0 # 304 Not Modified
+        self.misses = 0
+        self.evictions = 0
+        self.db = Database(db_path)
+        with self.db.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS article_cache (
+                    url TEXT PRIMARY KEY, content TEXT NOT NULL, title TEXT,
+                    etag TEXT, last_modified TEXT,
+                    fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_article_cache_accessed ON article_cache (accessed_at)")
+            self.total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM article_cache").fetchone()[0]
+
+    def get(self, url):
+        """
+        Returns the entry dict (content, title, etag, last_modified, fetched_at, fresh) or None.
+        """
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT content, title, etag, last_modified, fetched_at FROM article_cache WHERE url = ?",
+                               (url,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE article_cache SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        entry = dict(zip(('content', 'title', 'etag', 'last_modified', 'fetched_at'), row))
+        entry['fresh'] = time.time() - entry['fetched_at'] < self.freshness
+        if entry['fresh']:
+            with self._lock:
+                self.hits += 1
+        return entry
+
+    def put(self, url, content, title=None, etag=None, last_modified=None):
+        size = len(content.encode('utf-8')) + len((title or '').encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self.db.transaction() as conn:
+            old = conn.execute("SELECT size FROM article_cache WHERE url = ?", (url,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO article_cache (url, content, title, etag, last_modified, fetched_at, accessed_at, size) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (url, content, title, etag, last_modified, now, now, size))
+            self.total_bytes += size - (old[0] if old else 0)
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """Drops least recently used entries until the byte budget is met. Caller holds _lock."""
+        while self.total_bytes > self.max_bytes:
+            victims = conn.execute("SELECT url, size FROM article_cache ORDER BY accessed_at LIMIT ?",
+                                   (self.EVICT_BATCH,)).fetchall()
+            if not victims:
+                self.total_bytes = 0
+                break
+            for url, size in victims:
+                conn.execute("DELETE FROM article_cache WHERE url = ?", (url,))
+                self.total_bytes -= size; self.evictions += 1
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def touch(self, url):
+        """Marks an entry fresh again after the origin answered 304 Not Modified."""
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE article_cache SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+        with self._lock:
+            self.revalidated += 1
+
+    def clear(self):
+        with self._lock, self.db.transaction() as conn:
+            conn.execute("DELETE FROM article_cache")
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses,
+                    "evictions": self.evictions, "bytes": self.total_bytes, "max_bytes": self.max_bytes,
+                    "freshness": self.freshness}
@@ -0,0 +1,133 @@
+# backend/claims.py
+import hashlib
+import threading
+import time
+
+from db import Database
+
+# --- Local Claim-Review Index ---
+class ClaimIndex:
+    """
+    Every ClaimReview claim the Fact Check API has returned, kept in SQLite
+    with an inverted index (token -> claim ids) so later queries can be
+    answered locally. Scoring happens in one grouped query over the
+    postings of the query's tokens: the overlap count per candidate claim
+    gives its token Jaccard similarity without loading any claim text.
+    """
+    MAX_MATCHES = 10 # Same as the API's pageSize
+
+    def __init__(self, db_path, tokenize):
+        """
+        Args:
+            db_path: SQLite file for the claims, reviews and postings tables.
+            tokenize: Callable(text) -> set of tokens (similarity.tokenize); the same
+                      function must be used for harvesting and lookups.
+        """
+        self.db_path = db_path
+        self.tokenize = tokenize
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.local_hits = 0
+        self.harvested = 0 # New claims added by this process
+        self.db = Database(db_path)
+        with self.db.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS claims (
+                    id INTEGER PRIMARY KEY, claim_key TEXT NOT NULL UNIQUE, text TEXT NOT NULL,
+                    claimant TEXT, token_count INTEGER NOT NULL, harvested_at REAL NOT NULL)
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS claim_reviews (
+                    claim_id INTEGER NOT NULL, review_key TEXT NOT NULL, publisher TEXT, rating TEXT NOT NULL,
+                    url TEXT, review_date TEXT, PRIMARY KEY (claim_id, review_key))
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS claim_postings (
+                    token TEXT NOT NULL, claim_id INTEGER NOT NULL, PRIMARY KEY (token, claim_id)) WITHOUT ROWID
+            """)
+
+    @staticmethod
+    def _claim_key(text, claimant):
+        return hashlib.sha256(f"{' '.join(text.lower().split())}\x1f{claimant or ''}".encode('utf-8')).hexdigest()
+
+    def harvest(self, claims):
+        """
+        Stores the claims and reviews from one Fact Check API response.
+
+        Args:
+            claims: The response's 'claims' list (dicts with text, claimant and claimReview).
+
+        Returns:
+            The number of claims that were new to the index.
+        """
+        added = 0; now = time.time()
+        with self.db.transaction() as conn:
+            for claim in claims:
+                text = (claim.get('text') or '').strip()
+                tokens = self.tokenize(text)
+                if not tokens:
+                    continue
+                key = self._claim_key(text, claim.get('claimant'))
+                row = conn.execute("SELECT id FROM claims WHERE claim_key = ?", (key,)).fetchone()
+                if row is None:
+                    claim_id = conn.execute("INSERT INTO claims (claim_key, text, claimant, token_count, harvested_at) "
+                                            "VALUES (?, ?, ?, ?, ?)",
+                                            (key, text, claim.get('claimant'), len(tokens), now)).lastrowid
+                    conn.executemany("INSERT OR IGNORE INTO claim_postings (token, claim_id) VALUES (?, ?)",
+                                     [(token, claim_id) for token in tokens])
+                    added += 1
+                else:
+                    claim_id = row[0]
+                for review in claim.get('claimReview') or []:
+                    rating = (review.get('textualRating') or '').strip()
+                    if not rating:
+                        continue
+                    publisher = (review.get('publisher') or {}).get('name', 'N/A')
+                    # A review's verdict can be revised; the newest response wins
+                    conn.execute("INSERT OR REPLACE INTO claim_reviews (claim_id, review_key, publisher, rating, url, review_date) "
+                                 "VALUES (?, ?, ?, ?, ?, ?)",
+                                 (claim_id, review.get('url') or f"{publisher}\x1f{rating}", publisher, rating,
+                                  review.get('url'), review.get('reviewDate')))
+        with self._lock:
+            self.harvested += added
+        return added
+
+    def search(self, query, threshold, min_overlap=2):
+        """
+        Scores the stored claims against query.
+
+        Returns:
+            Up to MAX_MATCHES dicts (text, score, reviews as [(rating, publisher)]) with token
+            Jaccard similarity >= threshold and at least min_overlap shared tokens, best first.
+        """
+        tokens = self.tokenize(query)
+        with self._lock:
+            self.lookups += 1
+        if len(tokens) < min_overlap:
+            return []
+        conn = self.db.connect()
+        rows = conn.execute(
+            f"SELECT c.id, c.text, CAST(p.overlap AS REAL) / (? + c.token_count - p.overlap) AS score "
+            f"FROM (SELECT claim_id, COUNT(*) AS overlap FROM claim_postings WHERE token IN ({', '.join('?' * len(tokens))}) "
+            f"GROUP BY claim_id HAVING COUNT(*) >= ?) p JOIN claims c ON c.id = p.claim_id "
+            f"WHERE score >= ? ORDER BY score DESC, c.id LIMIT {self.MAX_MATCHES}",
+            (len(tokens), *tokens, min_overlap, threshold)).fetchall()
+        if not rows:
+            return []
+        reviews = {}
+        for claim_id, rating, publisher in conn.execute(
+                f"SELECT claim_id, rating, publisher FROM claim_reviews WHERE claim_id IN ({', '.join('?' * len(rows))})",
+                [row[0] for row in rows]):
+            reviews.setdefault(claim_id, []).append((rating, publisher))
+        return [{"text": row[1], "score": row[2], "reviews": reviews.get(row[0], [])} for row in rows]
+
+    def record_hit(self):
+        with self._lock:
+            self.local_hits += 1
+
+    def stats(self):
+        conn = self.db.connect()
+        with self._lock:
+            return {"claims": conn.execute("SELECT COUNT(*) FROM claims").fetchone()[0],
+                    "reviews": conn.execute("SELECT COUNT(*) FROM claim_reviews").fetchone()[0],
+                    "lookups": self.lookups, "local_hits": self.local_hits, "harvested": self.harvested}
@@ -0,0 +1,259 @@
+# backend/db.py
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+def split_statements(script):
+    """Splits an SQL script into complete statements (semicolons inside triggers are kept)."""
+    statements, pending = [], ''
+    for piece in script.split(';'):
+        pending += piece + ';'
+        if sqlite3.complete_statement(pending):
+            if pending.strip(' \n\t;'):
+                statements.append(pending.strip())
+            pending = ''
+    if pending.strip(' \n\t;'):
+        statements.append(pending.strip().rstrip(';'))
+    return statements
+
+# --- Per-Thread SQLite Access ---
+class Database:
+    """
+    Hands each thread its own connection to one SQLite file. Connections
+    are opened lazily, configured once (WAL journal, busy timeout, tuned
+    synchronous/cache pragmas) and reused for every later call on that
+    thread, so readers no longer block behind writers.
+
+    Long-lived threads (workers, the writer) simply keep theirs. Short-lived
+    threads, like the one Flask's threaded server starts per request, call
+    release() when done: the connection goes back to a small idle pool and
+    the next thread checks it out instead of reconnecting.
+    """
+    _instances = weakref.WeakSet() # For release_all()
+
+    def __init__(self, path, busy_timeout_ms=5000, cache_size_kib=16 * 1024, synchronous='NORMAL', pool_size=8):
+        """
+        Args:
+            path: SQLite database file.
+            busy_timeout_ms: How long a statement waits on a lock before "database is locked".
+            cache_size_kib: Page cache per connection.
+            synchronous: NORMAL is durable across application crashes in WAL mode and
+                         avoids an fsync per commit; use FULL to survive power loss too.
+            pool_size: Most released connections kept open for reuse; extras are closed.
+        """
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kib = cache_size_kib
+        self.synchronous = synchronous
+        self.pool_size = pool_size
+        self._local = threading.local()
+        self._idle = deque() # Released connections, most recently used last
+        self._pool_lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+        Database._instances.add(self)
+
+    def _open(self):
+        # Pooled connections move between threads, but only ever one thread uses each at a time
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}") # Negative means KiB, not pages
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def connect(self):
+        """Returns this thread's connection, taking an idle pooled one or opening a new one on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            with self._pool_lock:
+                conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    self.opened += 1
+                else:
+                    self.reused += 1
+            if conn is None:
+                conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    def release(self):
+        """Returns this thread's connection to the idle pool (closing it if the pool is full)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        if conn.in_transaction:
+            conn.rollback() # Never hand an open transaction to the next thread
+        with self._pool_lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Yields this thread's connection; commits on success, rolls back on error."""
+        conn = self.connect()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def close(self):
+        """Closes this thread's connection (the next call reopens it)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @classmethod
+    def release_all(cls):
+        """release() on every Database, e.g. at the end of a request."""
+        for db in list(cls._instances):
+            db.release()
+
+    def stats(self):
+        with self._pool_lock:
+            return {"opened": self.opened, "reused": self.reused, "idle": len(self._idle), "pool_size": self.pool_size}
+
+    def schema_version(self):
+        return self.connect().execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self, migrations):
+        """
+        Brings the schema up to date.
+
+        Args:
+            migrations: Ordered list of (version, description, step), where step is
+                        an SQL script or a callable taking the connection. Steps newer
+                        than the stored PRAGMA user_version run in order, each in its
+                        own transaction together with the version bump.
+
+        Returns:
+            The schema version afterwards.
+        """
+        conn = self.connect()
+        current = self.schema_version()
+        for version, description, step in migrations:
+            if version <= current:
+                continue
+            print(f"[DB] Migrating {self.path} to v{version}: {description}")
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                if callable(step):
+                    step(conn)
+                else:
+                    for statement in split_statements(step):
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version={int(version)}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            current = version
+        return current
+
+# --- Group-Commit Writer ---
+class GroupCommitWriter:
+    """
+    A single thread that owns the writes to one database. Callers submit
+    items and get a Future; the writer applies everything waiting (up to
+    max_batch items, or whatever arrived within max_latency of the first)
+    in one transaction, so many results share one commit and one fsync.
+    If a batch fails, its items are retried one transaction each so a bad
+    item only fails its own caller.
+    """
+    def __init__(self, db, write_fn, max_batch=64, max_latency=0.05, name='DBWriter'):
+        """
+        Args:
+            db: The Database to write to (the writer thread gets its own connection).
+            write_fn: Callable(conn, item) -> result, run inside the batch transaction.
+            max_batch: Most items per transaction.
+            max_latency: Longest an item waits for its batch to fill before it is committed;
+                         bounds how stale readers can be.
+        """
+        self.db = db
+        self.write_fn = write_fn
+        self.max_batch = max(1, max_batch)
+        self.max_latency = max_latency
+        self.name = name
+        self._pending = deque() # (item, Future)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.commits = 0
+        self.items = 0
+        self.fallbacks = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queues one item for the next batch and returns a Future for write_fn's result."""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed.")
+            self._pending.append((item, future))
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    break
+                deadline = time.monotonic() + self.max_latency
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        break
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+            self._flush(batch)
+        self.db.close()
+
+    def _flush(self, batch):
+        conn = self.db.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            results = [self.write_fn(conn, item) for item, _ in batch]
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            with self._cond:
+                self.fallbacks += 1
+            print(f"[{self.name}] Batch of {len(batch)} failed ({e}); writing items one by one.")
+            for item, future in batch:
+                try:
+                    with self.db.transaction() as conn:
+                        result = self.write_fn(conn, item)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            return
+        with self._cond:
+            self.commits += 1; self.items += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self):
+        with self._cond:
+            return {"commits": self.commits, "items": self.items, "fallbacks": self.fallbacks,
+                    "pending": len(self._pending), "max_batch": self.max_batch, "max_latency": self.max_latency}
+
+    def close(self, timeout=None):
+        """Commits whatever is pending, then stops the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
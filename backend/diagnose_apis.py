@@ -1,5 +1,6 @@
 # Simple API diagnostics without exposing secrets.
-import os, json, requests
+import os, json
+from upstream import UpstreamClient
 
 # Load config or env
 try:
@@ -12,6 +13,9 @@ except Exception:
         GNEWS_API_KEY = os.environ.get('GNEWS_API_KEY')
     config = _Cfg()
 
+# Same pooled, retrying client the backend uses
+UPSTREAM = UpstreamClient()
+
 
 def test_fact_check():
     key = getattr(config, 'GOOGLE_API_KEY', None)
@@ -19,7 +23,7 @@ def test_fact_check():
         return {"configured": False, "ok": False, "reason": "Missing GOOGLE_API_KEY"}
     url = "https://factchecktools.googleapis.com/v1alpha1/claims:search"
     try:
-        r = requests.get(url, params={"query": "earth is round", "key": key, "languageCode": "en-US", "pageSize": 1}, timeout=8)
+        r = UPSTREAM.get(url, params={"query": "earth is round", "key": key, "languageCode": "en-US", "pageSize": 1}, timeout=8)
         ok = (r.status_code == 200)
         payload = {}
         try:
@@ -37,7 +41,7 @@ def test_newsapi():
         return {"configured": False, "ok": False, "reason": "Missing NEWS_API_KEY"}
     url = "https://newsapi.org/v2/everything"
     try:
-        r = requests.get(url, params={"q": "OpenAI", "apiKey": key, "pageSize": 1}, timeout=8)
+        r = UPSTREAM.get(url, params={"q": "OpenAI", "apiKey": key, "pageSize": 1}, timeout=8)
         ok = (r.status_code == 200)
         payload = {}
         try:
@@ -55,7 +59,7 @@ def test_gnews():
         return {"configured": False, "ok": False, "reason": "Missing GNEWS_API_KEY"}
     url = "https://gnews.io/api/v4/search"
     try:
-        r = requests.get(url, params={"q": "OpenAI", "lang": "en", "max": 1, "token": key}, timeout=8)
+        r = UPSTREAM.get(url, params={"q": "OpenAI", "lang": "en", "max": 1, "token": key}, timeout=8)
         ok = (r.status_code == 200)
         payload = {}
         try:
@@ -84,11 +88,12 @@ def test_gemini():
             properties={"ok": types.Schema(type=types.Type.BOOLEAN)},
             required=["ok"],
         )
-        resp = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents='Respond ONLY with {"ok": true}',
-            config=types.GenerateContentConfig(response_mime_type="application/json", response_schema=schema, temperature=0.0)
-        )
+        with UPSTREAM.track('generativelanguage.googleapis.com'):
+            resp = client.models.generate_content(
+                model='gemini-2.5-flash',
+                contents='Respond ONLY with {"ok": true}',
+                config=types.GenerateContentConfig(response_mime_type="application/json", response_schema=schema, temperature=0.0)
+            )
         sample = {}
         try:
             sample = resp.text
@@ -105,5 +110,6 @@ if __name__ == "__main__":
         "newsapi": test_newsapi(),
         "gnews": test_gnews(),
         "gemini": test_gemini(),
+        "latency": UPSTREAM.stats(),
     }
     print(json.dumps(results, indent=2))
@@ -1,12 +1,502 @@
 # backend/dsa.py
 import hashlib
-from collections import deque
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+from collections import deque, OrderedDict
+
+# --- Blocking Job Queue Class ---
+class JobQueue:
+    """
+    A thread-safe FIFO queue for analysis jobs.
+    Consumers block on a condition variable instead of polling, and the queue
+    can be closed so that workers drain what is left and then exit.
+    """
+    def __init__(self):
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._unfinished = 0 # Jobs handed out (or waiting) but not yet marked done
+        self._closed = False
+
+    def put(self, job):
+        """Adds a job to the back of the queue and wakes one waiting worker."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Job queue is closed.")
+            self._items.append(job)
+            self._unfinished += 1
+            self._cond.notify()
+
+    def put_many(self, jobs):
+        """Adds several jobs under one lock acquisition and wakes as many workers."""
+        jobs = list(jobs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Job queue is closed.")
+            self._items.extend(jobs)
+            self._unfinished += len(jobs)
+            self._cond.notify(len(jobs))
+
+    def get(self, timeout=None):
+        """
+        Removes and returns the next job, blocking until one is available.
+
+        Returns:
+            The job, or None if the queue was closed and is empty
+            (or the optional timeout expired first).
+        """
+        with self._cond:
+            while not self._items and not self._closed:
+                if not self._cond.wait(timeout):
+                    return None
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def task_done(self, job=None, error=None, retry=True):
+        """Marks one previously fetched job as finished.
+
+        The arguments match DurableJobQueue.task_done; in memory nothing is retried.
+        """
+        with self._cond:
+            self._unfinished = max(0, self._unfinished - 1)
+            if self._unfinished == 0:
+                self._cond.notify_all()
+        return 'failed' if error is not None else 'done'
+
+    def retry_later(self, job, delay, on_error=None):
+        """Puts a job back on the queue after delay seconds (on a timer thread).
+
+        Args:
+            on_error: Called if the queue was closed by the time the delay ran out.
+        """
+        def put_back():
+            try:
+                self.put(job)
+            except RuntimeError: # Queue closed by shutdown while we were waiting
+                if on_error is not None:
+                    on_error()
+
+        timer = threading.Timer(delay, put_back); timer.daemon = True; timer.start()
+
+    def join(self, timeout=None):
+        """Waits until every queued job has been processed. Returns True if drained."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._unfinished == 0, timeout)
+
+    def close(self, drain=True):
+        """
+        Stops accepting new jobs and wakes every waiting worker.
+
+        Args:
+            drain: If True, jobs already queued are still handed out;
+                   if False, they are discarded.
+        """
+        with self._cond:
+            self._closed = True
+            if not drain:
+                self._unfinished -= len(self._items)
+                self._items.clear()
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+# --- Job Registry Class ---
+class JobRegistry:
+    """
+    Tracks every submitted job by id so a client can ask about its own job
+    instead of guessing from the latest row in the database.
+    Every update bumps the job's version and wakes waiters, which is what
+    long-polling and event streams block on.
+    Finished jobs are kept in insertion order and the oldest are evicted
+    once more than max_finished have piled up (except jobs being watched).
+    """
+    FINISHED_STATES = ('done', 'failed')
+
+    def __init__(self, max_finished=5000):
+        self._jobs = OrderedDict()
+        self._cond = threading.Condition()
+        self._watches = {} # job_id -> [JobWatch]
+        self.max_finished = max_finished
+
+    def create(self, **fields):
+        """Registers a new job and returns its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._cond:
+            self._jobs[job_id] = dict(fields, id=job_id, version=1, created_at=now, updated_at=now)
+            self._evict()
+        return job_id
+
+    def restore(self, job_id, **fields):
+        """Re-registers a job under its existing id (e.g. one recovered from a durable queue after a restart)."""
+        now = time.time()
+        with self._cond:
+            if job_id not in self._jobs:
+                self._jobs[job_id] = dict(fields, id=job_id, version=1, created_at=now, updated_at=now)
+                self._evict()
+        return job_id
+
+    def update(self, job_id, **fields):
+        """Merges fields into a job record and wakes waiters. Unknown ids are ignored."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields); job['version'] += 1; job['updated_at'] = time.time()
+            self._cond.notify_all()
+            if job.get('status') in self.FINISHED_STATES:
+                for watch in self._watches.get(job_id, ()):
+                    watch._push(job_id, dict(job))
+            return dict(job)
+
+    def get(self, job_id):
+        """Returns a copy of the job record, or None if unknown (or evicted)."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def wait(self, job_id, since_version=0, timeout=None):
+        """
+        Blocks until the job changes past since_version or is finished.
+
+        Returns:
+            A copy of the job record (possibly unchanged if the timeout hit),
+            or None if the job is unknown.
+        """
+        def ready():
+            job = self._jobs.get(job_id)
+            return job is None or job['version'] > since_version or job.get('status') in self.FINISHED_STATES
+        with self._cond:
+            self._cond.wait_for(ready, timeout)
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def watch(self, job_ids):
+        """
+        Starts collecting finish notifications for job_ids (see JobWatch).
+        Jobs already finished (or unknown) are reported right away. Close the
+        watch when done with it, since watched jobs are never evicted.
+        """
+        watch = JobWatch(self, job_ids)
+        with self._cond:
+            for job_id in watch.job_ids:
+                self._watches.setdefault(job_id, []).append(watch)
+                job = self._jobs.get(job_id)
+                if job is None or job.get('status') in self.FINISHED_STATES:
+                    watch._push(job_id, dict(job) if job is not None else None)
+        return watch
+
+    def _unwatch(self, watch):
+        with self._cond:
+            for job_id in watch.job_ids:
+                watches = self._watches.get(job_id)
+                if watches and watch in watches:
+                    watches.remove(watch)
+                    if not watches:
+                        del self._watches[job_id]
+
+    def is_finished(self, job):
+        return bool(job) and job.get('status') in self.FINISHED_STATES
+
+    def _evict(self):
+        if len(self._jobs) <= self.max_finished:
+            return
+        finished = [jid for jid, job in self._jobs.items()
+                    if job.get('status') in self.FINISHED_STATES and jid not in self._watches]
+        for jid in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[jid]
+
+    def __len__(self):
+        with self._cond:
+            return len(self._jobs)
+
+class JobWatch:
+    """
+    Finish notifications for a fixed set of jobs, e.g. one batch request.
+    The registry pushes each job here as it finishes, so waking up costs the
+    same however many jobs are watched, and nothing rescans the set under
+    the registry's lock. Each job is reported once.
+    """
+    def __init__(self, registry, job_ids):
+        self.registry = registry
+        self.job_ids = frozenset(job_ids)
+        self._unreported = set(self.job_ids)
+        self._ready = deque() # (job_id, job copy or None)
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _push(self, job_id, job):
+        with self._cond:
+            if job_id in self._unreported:
+                self._unreported.discard(job_id)
+                self._ready.append((job_id, job))
+                self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """
+        Blocks until at least one watched job is finished (or unknown).
+
+        Returns:
+            A list of (job_id, job copy or None) for every job finished since the
+            last call; empty if the timeout hit first.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._ready, timeout)
+            ready = list(self._ready); self._ready.clear()
+            return ready
+
+    def close(self):
+        """Stops watching; the jobs become evictable again. Safe to call more than once."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+        self.registry._unwatch(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# --- TTL + LRU Cache Class ---
+class TTLCache:
+    """
+    A bounded key/value cache with least-recently-used eviction,
+    where every entry also expires after its own time-to-live.
+    """
+    def __init__(self, max_size=1024, ttl=3600):
+        """
+        Args:
+            max_size: Max number of entries before the least recently used is evicted.
+            ttl: Default time-to-live in seconds.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict() # key -> (expires_at, value), oldest use first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Returns the cached value (marking it recently used), or default if missing/expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] <= time.time():
+                del self._data[key]
+                self.expirations += 1; self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """Stores a value, evicting the least recently used entries if full."""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "max_size": self.max_size, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions, "expirations": self.expirations}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+# --- Bloom Filter Class ---
+class BloomFilter:
+    """
+    A fixed-size bit array that remembers which keys were added, in about
+    1.44 * log2(1/error_rate) bits per key instead of a whole string each.
+    Lookups can return false positives (about error_rate of them while at most
+    capacity keys were added) but never false negatives, so a miss is
+    definitive and a hit must be confirmed against the real store.
+
+    With a path, the bits live in a file mapped into memory: loading is
+    instant whatever the size, and the OS writes changes back. Processes
+    mapping the same file share its bits. A rebuilt file is swapped in with
+    replace(), which marks the old one retired; every process still mapping
+    it then reopens the path on its next lookup or add, so no add is lost to
+    a file nobody reads.
+    """
+    MAGIC = b'VRIBLOOM'
+    HEADER = struct.Struct('<8sIQQIQQ') # magic, format version, capacity, bits, hashes, count, watermark
+    HEADER_SIZE = 64
+    RETIRED = struct.pack('<I', 0xFFFFFFFF) # Stamped over the format version of a replaced file
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001, path=None):
+        """
+        Args:
+            capacity: Keys the filter is sized for; past it the false-positive rate climbs.
+            error_rate: Target false-positive rate at capacity.
+            path: Optional backing file. An existing valid file is reused as is
+                  (its own geometry wins over capacity/error_rate).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        if path and os.path.exists(path) and self._open(path):
+            return
+        self.capacity = max(1, int(capacity))
+        self.bits = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2 / 8) * 8)
+        self.hashes = max(1, round(self.bits / self.capacity * math.log(2)))
+        self.count = 0 # Keys that set at least one new bit (approximately the distinct keys added)
+        self.watermark = 0 # Caller-defined sync position, persisted with the bits
+        if path:
+            with open(path, 'wb') as f:
+                f.write(self.HEADER.pack(self.MAGIC, 1, self.capacity, self.bits, self.hashes, 0, 0).ljust(self.HEADER_SIZE, b'\0'))
+                f.truncate(self.HEADER_SIZE + self.bits // 8) # Sparse: zero pages cost no disk until set
+            self._open(path)
+        else:
+            self._bits = bytearray(self.bits // 8)
+
+    def _open(self, path):
+        f = open(path, 'r+b')
+        header = f.read(self.HEADER.size)
+        if len(header) < self.HEADER.size:
+            f.close(); return False
+        magic, version, capacity, bits, hashes, count, watermark = self.HEADER.unpack(header)
+        if magic != self.MAGIC or version != 1 or os.path.getsize(path) != self.HEADER_SIZE + bits // 8:
+            f.close(); return False
+        self.capacity, self.bits, self.hashes, self.count, self.watermark = capacity, bits, hashes, count, watermark
+        self._file = f
+        self._map = mmap.mmap(f.fileno(), 0)
+        self._bits = memoryview(self._map)[self.HEADER_SIZE:]
+        return True
+
+    def _write_header(self):
+        if self._file is not None:
+            version = 0xFFFFFFFF if self._retired() else 1 # Never un-retire a replaced file
+            self._map[:self.HEADER.size] = self.HEADER.pack(self.MAGIC, version, self.capacity, self.bits, self.hashes,
+                                                            self.count, self.watermark)
+
+    def _retired(self):
+        return self._map[8:12] == self.RETIRED
+
+    def _follow_replacement(self):
+        """Reopens path if another process replaced the mapped file with a rebuilt one."""
+        if self._file is None or not self._retired():
+            return
+        with self._lock:
+            old_file = self._file
+            if old_file is None or not self._retired() or not self._open(self.path):
+                return # Already followed, or the replacement is not in place yet
+            old_file.close() # The old mapping is freed once no lookup still holds it
+
+    @classmethod
+    def replace(cls, src, dst):
+        """
+        Moves the filter file src over dst, then marks the file it replaced as
+        retired so processes still mapping it switch to the new one.
+        """
+        try:
+            old = open(dst, 'r+b')
+        except FileNotFoundError:
+            old = None
+        try:
+            os.replace(src, dst)
+            if old is not None and old.read(8) == cls.MAGIC:
+                old.write(cls.RETIRED) # Seen at once through every mapping of that file
+        finally:
+            if old is not None:
+                old.close()
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one 128-bit digest
+        digest = hashlib.blake2b(key.encode('utf-8') if isinstance(key, str) else key, digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        """Adds a key. Returns True if it was (definitely) not in the filter before."""
+        self._follow_replacement() # First: a replacement can have a different geometry
+        positions = self._positions(key)
+        with self._lock:
+            new = False
+            for pos in positions:
+                byte, mask = pos >> 3, 1 << (pos & 7)
+                if not self._bits[byte] & mask:
+                    self._bits[byte] |= mask; new = True
+            if new:
+                self.count += 1
+            return new
+
+    def __contains__(self, key):
+        self._follow_replacement()
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def clear(self):
+        """Forgets every key (the watermark is kept)."""
+        with self._lock:
+            self._bits[:] = bytes(len(self._bits))
+            self.count = 0
+            self._write_header()
+
+    def flush(self):
+        """Writes the header and any changed bits back to the file."""
+        with self._lock:
+            if self._file is not None:
+                self._write_header()
+                self._map.flush()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._bits.release(); self._map.close(); self._file.close()
+            self._file = None
+            self._bits = bytearray(self.bits // 8) # A closed filter reports every key as absent
+
+    def false_positive_rate(self):
+        """Expected false-positive rate at the current fill."""
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def stats(self):
+        return {"count": self.count, "capacity": self.capacity, "bytes": self.bits // 8, "hashes": self.hashes,
+                "false_positive_rate": round(self.false_positive_rate(), 6), "persisted": self._file is not None}
+
+    def __len__(self):
+        return self.count
 
 # --- Shared DSA State ---
-# Queue for incoming analysis jobs (FIFO)
-job_queue = deque()
-# Hash table (set) to track hashes of processed content (for deduplication)
-seen_hashes = set()
+# Queue for incoming analysis jobs (FIFO, blocking)
+job_queue = JobQueue()
+# Queue for URL submissions waiting on article fetch/extraction
+fetch_queue = JobQueue()
+# Hash table (dict) of job id -> status record
+job_registry = JobRegistry()
+# Bloom filter of analyzed text hashes (for deduplication; hits are confirmed against the DB)
+seen_index = BloomFilter()
 
 # --- Merkle Tree Class ---
 class MerkleTree:
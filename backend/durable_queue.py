@@ -0,0 +1,263 @@
+# backend/durable_queue.py
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+# --- Durable Job Queue ---
+class DurableJobQueue:
+    """
+    A job queue for one pipeline stage, persisted in the SQLite `jobs` table
+    so queued and in-flight work survives restarts and crashes, and any
+    number of worker threads and processes can share it.
+
+    Jobs move queued -> running -> done or failed. Taking a job leases it for
+    visibility_timeout seconds; if its worker dies, the lease expires and the
+    job is handed out again. Each lease counts as an attempt, and a job that
+    keeps failing (or keeps losing its worker) past max_attempts is
+    dead-lettered: left in state failed with its last error.
+
+    Has the same interface as dsa.JobQueue, so the stage workers can use either.
+    """
+    READY_SQL = ("stage = ? AND ((state = 'queued' AND available_at <= ?) "
+                 "OR (state = 'running' AND lease_expires_at <= ?))")
+    PRUNE_EVERY = 500 # Finished jobs between sweeps of old done rows
+
+    def __init__(self, db, stage, visibility_timeout=120.0, max_attempts=5, poll_interval=0.5, retry_backoff=5.0,
+                 retention=7 * 24 * 3600.0):
+        """
+        Args:
+            db: Database holding the jobs table (created by the schema migrations).
+            stage: Stage name; each stage's jobs are handed out separately.
+            visibility_timeout: Seconds a leased job stays invisible to other workers.
+                                Must exceed the longest time a job can take.
+            max_attempts: Leases a job gets before it is dead-lettered.
+            poll_interval: How often an idle get() looks for jobs put by other processes.
+            retry_backoff: Base delay before a job whose handler raised is retried
+                           (multiplied by the attempt number).
+            retention: Seconds done jobs are kept (for status lookups) before being deleted.
+                       Failed (dead-lettered) jobs are kept for inspection.
+        """
+        self.db = db
+        self.stage = stage
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.retention = retention
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._cond = threading.Condition()
+        self._closed = False
+        self._drain = True
+        self._in_flight = 0 # Jobs leased by this process and not yet finished
+        self._finished = 0
+
+    # --- Producing ---
+    def put(self, job):
+        """Persists a job at the back of the queue and wakes one waiting worker."""
+        self.put_many([job])
+
+    def put_many(self, jobs):
+        """Persists several jobs in one transaction."""
+        jobs = list(jobs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Job queue is closed.")
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO jobs (job_id, stage, payload, state, attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', 0, ?, ?, ?)",
+                [(job.get('job_id'), self.stage, self._dump(job), now, now, now) for job in jobs])
+        with self._cond:
+            self._cond.notify(len(jobs))
+
+    @staticmethod
+    def _dump(job):
+        return json.dumps({k: v for k, v in job.items() if not k.startswith('_')}) # Lease bookkeeping stays out
+
+    # --- Consuming ---
+    def get(self, timeout=None):
+        """
+        Leases and returns the next available job, blocking until one is available.
+
+        Returns:
+            The job dict (with _queue_id/_lease/_attempt bookkeeping keys), or None if
+            the queue was closed and has nothing left to hand out (or the timeout expired).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._closed and not self._drain:
+                    return None
+            job = self._lease()
+            if job is not None:
+                with self._cond:
+                    self._in_flight += 1
+                return job
+            with self._cond:
+                if self._closed:
+                    return None # Drained: nothing is available right now
+                wait = self.poll_interval if deadline is None else min(self.poll_interval, deadline - time.monotonic())
+                if wait <= 0:
+                    return None
+                self._cond.wait(wait) # Woken early by put() in this process
+
+    def _lease(self):
+        """Atomically claims the oldest available job (or one whose lease expired)."""
+        while True:
+            now = time.time(); token = f"{self.owner}:{uuid.uuid4().hex}"
+            conn = self.db.connect()
+            # Idle polls only read, so they never take the write lock
+            if conn.execute(f"SELECT 1 FROM jobs WHERE {self.READY_SQL} LIMIT 1", (self.stage, now, now)).fetchone() is None:
+                return None
+            with self.db.transaction() as conn:
+                # One UPDATE is atomic under SQLite's write lock, so two workers can never claim the same row
+                claimed = conn.execute(
+                    "UPDATE jobs SET state = 'running', lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1, updated_at = ? "
+                    f"WHERE id = (SELECT id FROM jobs WHERE {self.READY_SQL} ORDER BY available_at, id LIMIT 1)",
+                    (token, now + self.visibility_timeout, now, self.stage, now, now)).rowcount
+                if not claimed:
+                    return None
+                row = conn.execute("SELECT id, payload, attempts, last_error FROM jobs WHERE lease_owner = ?", (token,)).fetchone()
+                if row['attempts'] > self.max_attempts:
+                    error = row['last_error'] or "Worker lease expired too many times."
+                    print(f"[Queue:{self.stage}] Dead-lettering job {row['id']} after {row['attempts'] - 1} attempts: {error}")
+                    conn.execute("UPDATE jobs SET state = 'failed', lease_owner = NULL, lease_expires_at = NULL, last_error = ?, "
+                                 "updated_at = ? WHERE id = ?", (error, now, row['id']))
+                    continue
+            job = json.loads(row['payload'])
+            job.update(_queue_id=row['id'], _lease=token, _attempt=row['attempts'])
+            return job
+
+    def task_done(self, job=None, error=None, retry=True):
+        """
+        Finishes a leased job.
+
+        Args:
+            job: The job returned by get(). Without it (dsa.JobQueue-style calls) nothing is recorded.
+            error: If set, the job failed with this message.
+            retry: For failures, whether to retry after a backoff (until max_attempts)
+                   or fail the job right away.
+
+        Returns:
+            The job's new state: 'done', 'queued' (to be retried) or 'failed'.
+        """
+        if job is None:
+            return None
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._finished += 1
+            prune = self._finished % self.PRUNE_EVERY == 0
+            if self._in_flight == 0:
+                self._cond.notify_all()
+        if prune:
+            self.prune()
+        if job.get('_released'): # Already put back with retry_later()
+            return 'queued'
+        now = time.time()
+        if error is None:
+            state, available_at = 'done', None
+        elif retry and job['_attempt'] < self.max_attempts:
+            state, available_at = 'queued', now + self.retry_backoff * job['_attempt']
+        else:
+            state, available_at = 'failed', None
+        with self.db.transaction() as conn:
+            # Only the current lease holder may finish the job; a stale worker's update is a no-op
+            conn.execute("UPDATE jobs SET state = ?, available_at = COALESCE(?, available_at), last_error = COALESCE(?, last_error), "
+                         "lease_owner = NULL, lease_expires_at = NULL, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                         (state, available_at, error, now, job['_queue_id'], job['_lease']))
+        return state
+
+    def retry_later(self, job, delay, on_error=None):
+        """
+        Releases a leased job to be handed out again after delay seconds.
+        The deferral does not count as a failed attempt. (on_error is accepted
+        for dsa.JobQueue compatibility; nothing is lost on shutdown here.)
+        """
+        job['_released'] = True
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE jobs SET state = 'queued', payload = ?, available_at = ?, attempts = MAX(attempts - 1, 0), "
+                         "lease_owner = NULL, lease_expires_at = NULL, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                         (self._dump(job), now + delay, now, job['_queue_id'], job['_lease']))
+
+    def prune(self):
+        """Deletes this stage's done jobs older than retention. Returns how many were deleted."""
+        with self.db.transaction() as conn:
+            return conn.execute("DELETE FROM jobs WHERE stage = ? AND state = 'done' AND updated_at < ?",
+                                (self.stage, time.time() - self.retention)).rowcount
+
+    # --- Lifecycle ---
+    def recover(self):
+        """
+        Re-queues jobs left running by a process on this host that is no longer alive
+        (e.g. after a crash), without waiting for their leases to expire. Call it at
+        startup, before this process leases anything.
+
+        Returns:
+            The number of jobs re-queued.
+        """
+        host = socket.gethostname(); now = time.time(); recovered = 0
+        with self.db.transaction() as conn:
+            rows = conn.execute("SELECT id, lease_owner FROM jobs WHERE stage = ? AND state = 'running'", (self.stage,)).fetchall()
+            for row in rows:
+                owner_host, _, rest = (row['lease_owner'] or '').partition(':')
+                pid = rest.partition(':')[0]
+                # This process has only just started, so a lease under its own PID is from an earlier
+                # process that had the same PID (common in containers, where the server is often PID 1)
+                if owner_host == host and pid.isdigit() and (int(pid) == os.getpid() or not _pid_alive(int(pid))):
+                    conn.execute("UPDATE jobs SET state = 'queued', available_at = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                                 "updated_at = ? WHERE id = ?", (now, now, row['id']))
+                    recovered += 1
+        if recovered:
+            print(f"[Queue:{self.stage}] Re-queued {recovered} job(s) from a stopped worker process.")
+        return recovered
+
+    def unfinished(self):
+        """Returns (job_id, state) for every queued or running job of this stage."""
+        rows = self.db.connect().execute("SELECT job_id, state FROM jobs WHERE stage = ? AND state IN ('queued', 'running')",
+                                         (self.stage,)).fetchall()
+        return [(row['job_id'], row['state']) for row in rows]
+
+    def join(self, timeout=None):
+        """Waits until every job leased by this process has been finished. Returns True if so."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._in_flight == 0, timeout)
+
+    def close(self, drain=True):
+        """
+        Stops accepting new jobs and wakes every waiting worker.
+
+        Args:
+            drain: If True, jobs already available are still handed out; if False,
+                   get() returns None at once. Either way nothing is deleted:
+                   whatever is left runs after the next start.
+        """
+        with self._cond:
+            self._closed = True
+            self._drain = drain
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def counts(self):
+        """Jobs of this stage per state."""
+        rows = self.db.connect().execute("SELECT state, COUNT(*) AS n FROM jobs WHERE stage = ? GROUP BY state", (self.stage,)).fetchall()
+        return {row['state']: row['n'] for row in rows}
+
+    def __len__(self):
+        return self.counts().get('queued', 0)
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True # Exists, owned by someone else
+    return True
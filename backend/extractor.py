@@ -0,0 +1,170 @@
+# backend/extractor.py
+import codecs
+import time
+from html.parser import HTMLParser
+
+MAX_PARAGRAPHS = 5 # Only the opening paragraphs are needed for fact-checking
+MIN_PARAGRAPH_CHARS = 30 # Shorter paragraphs are usually captions, bylines or ads
+MAX_BODY_CHARS = 1000
+
+# --- Incremental Article Parser ---
+class ArticleParser(HTMLParser):
+    """
+    Incremental HTML parser that picks out only what the analyzer needs:
+    the title (og:title, else <title>), the description (og:description,
+    else meta description) and the first paragraphs of the first <article>.
+    Sets done as soon as those are complete so the caller can stop reading.
+    """
+    def __init__(self, max_paragraphs=MAX_PARAGRAPHS):
+        super().__init__(convert_charrefs=True)
+        self.max_paragraphs = max_paragraphs
+        self.og_title = None
+        self.html_title = None
+        self.og_description = None
+        self.meta_description = None
+        self.paragraphs = []
+        self.done = False
+        self._title_parts = None # Collecting <title> text while not None
+        self._article_depth = 0
+        self._article_seen = False
+        self._skip_depth = 0 # Inside <script>/<style>
+        self._p_parts = None # Collecting an article paragraph while not None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'meta':
+            a = dict(attrs)
+            content = (a.get('content') or '').strip()
+            if not content:
+                return
+            prop = (a.get('property') or '').lower(); name = (a.get('name') or '').lower()
+            if prop == 'og:title' and self.og_title is None:
+                self.og_title = content
+            elif prop == 'og:description' and self.og_description is None:
+                self.og_description = content
+            elif name == 'description' and self.meta_description is None:
+                self.meta_description = content
+        elif tag == 'title' and self.html_title is None and not self._article_depth:
+            self._title_parts = []
+        elif tag == 'article' and not self._article_seen:
+            self._article_depth += 1 # Also counts articles nested inside the first one
+        elif tag in ('script', 'style'):
+            self._skip_depth += 1
+        elif tag == 'p' and self._article_depth:
+            self._end_paragraph() # <p> may be left unclosed
+            self._p_parts = []
+
+    def handle_endtag(self, tag):
+        if tag == 'title' and self._title_parts is not None:
+            self.html_title = ''.join(self._title_parts).strip() or None
+            self._title_parts = None
+        elif tag in ('script', 'style') and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == 'p':
+            self._end_paragraph()
+        elif tag == 'article' and self._article_depth:
+            self._article_depth -= 1
+            if not self._article_depth:
+                self._end_paragraph()
+                self._article_seen = True
+                self.done = True # Only the first article is used
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        if self._p_parts is not None:
+            self._p_parts.append(data)
+
+    def _end_paragraph(self):
+        if self._p_parts is None:
+            return
+        self.paragraphs.append(' '.join(''.join(self._p_parts).split()))
+        self._p_parts = None
+        if len(self.paragraphs) >= self.max_paragraphs:
+            self.done = True
+
+    @property
+    def title(self):
+        return self.og_title or self.html_title
+
+    @property
+    def description(self):
+        return self.og_description or self.meta_description
+
+    def body(self):
+        """The substantial paragraphs among the first ones seen, joined."""
+        paras = [p for p in self.paragraphs[:self.max_paragraphs] if len(p) > MIN_PARAGRAPH_CHARS]
+        return ' '.join(paras) or None
+
+# --- Combining Extracted Fields ---
+def compose_article_text(title, description, body):
+    """Joins title, description and body with ' | ' the way the analyzer expects.
+
+    Returns:
+        The combined text, or None if nothing was extracted.
+    """
+    combined_text = []
+    if title:
+        combined_text.append(title)
+    if description and description not in (title or ''):
+        combined_text.append(description)
+    if body:
+        # Limit body to reasonable length (around 1000 chars)
+        if len(body) > MAX_BODY_CHARS:
+            body = body[:MAX_BODY_CHARS] + '...'
+        combined_text.append(body)
+    return ' | '.join(combined_text) if combined_text else None
+
+# --- Streaming Extraction ---
+def extract_from_chunks(chunks, encoding='utf-8', max_bytes=2 * 1024 * 1024, max_seconds=None, stop_event=None):
+    """
+    Feeds byte chunks into an ArticleParser until it has what it needs,
+    the byte cap is reached, max_seconds have elapsed, or stop_event is set.
+
+    Args:
+        chunks: Iterable of bytes (e.g. response.iter_content()).
+        encoding: Charset used to decode the bytes incrementally.
+        max_bytes: Hard cap on bytes read.
+        max_seconds: Optional wall-clock budget for reading.
+        stop_event: Optional threading.Event; once set, reading is abandoned.
+
+    Returns:
+        dict with status, content, title, bytes_read and stopped_early/truncated flags.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    parser = ArticleParser()
+    start = time.monotonic(); bytes_read = 0; truncated = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if bytes_read + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - bytes_read]; truncated = True
+        bytes_read += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if parser.done or truncated:
+            break
+        if max_seconds is not None and time.monotonic() - start > max_seconds:
+            truncated = True
+            break
+        if stop_event is not None and stop_event.is_set():
+            return {"status": "cancelled", "message": "Extraction cancelled.", "bytes_read": bytes_read}
+    else:
+        parser.feed(decoder.decode(b'', final=True))
+        parser.close()
+    content = compose_article_text(parser.title, parser.description, parser.body())
+    if not content:
+        return {"status": "not_found", "message": "No article content found.", "bytes_read": bytes_read}
+    return {"status": "success", "content": content, "title": parser.title, "bytes_read": bytes_read,
+            "stopped_early": parser.done, "truncated": truncated}
+
+def extract_from_response(response, max_bytes=2 * 1024 * 1024, max_seconds=None, chunk_size=16 * 1024, stop_event=None):
+    """Streams a requests.Response (opened with stream=True) through the extractor and closes it."""
+    try:
+        return extract_from_chunks(response.iter_content(chunk_size=chunk_size), response.encoding,
+                                   max_bytes=max_bytes, max_seconds=max_seconds, stop_event=stop_event)
+    finally:
+        response.close()
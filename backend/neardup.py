@@ -0,0 +1,101 @@
+# backend/neardup.py
+import hashlib
+import random
+import struct
+
+from similarity import QueryMatcher
+
+MERSENNE_PRIME = (1 << 61) - 1
+NUM_PERM = 64 # MinHash permutations; changing these invalidates stored band keys
+BANDS = 16 # 16 bands of 4 rows: texts with Jaccard 0.8 collide in some band 99.98% of the time, 0.3 only 12%
+MIN_TOKENS = 3 # Shorter texts are too ambiguous to link by similarity
+
+# --- MinHash / LSH ---
+class MinHashLSH:
+    """
+    MinHash signatures cut into LSH bands. Two token sets share a band key
+    with a probability that rises steeply with their Jaccard similarity, so
+    looking up a text's band keys finds its near-duplicates without comparing
+    it to every stored text. Candidates are then confirmed with the exact
+    Jaccard similarity of their tokens.
+    """
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands.")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed) # Fixed seed: keys must match across runs and processes
+        self._perms = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    @staticmethod
+    def _token_hash(token):
+        return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def signature(self, tokens):
+        """The MinHash signature (num_perm ints) of a non-empty token set."""
+        hashes = [self._token_hash(t) for t in tokens]
+        return [min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self._perms]
+
+    def band_keys(self, tokens):
+        """One signed 64-bit key per band (SQLite INTEGER), or [] if there are too few tokens."""
+        if len(tokens) < MIN_TOKENS:
+            return []
+        sig = self.signature(tokens)
+        keys = []
+        for band in range(self.bands):
+            rows = sig[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(struct.pack(f'<I{self.rows}Q', band, *rows), digest_size=8).digest()
+            keys.append(int.from_bytes(digest, 'little', signed=True))
+        return keys
+
+# --- SQLite-Backed Index ---
+class NearDuplicateIndex:
+    """
+    Band keys of every saved analysis in a near_dup_bands table next to
+    analysis_results (created by the schema migrations, which also add a
+    trigger that drops a row's keys when the row is deleted).
+    """
+    MAX_CANDIDATES = 200 # Bounds the work when a band bucket is very popular
+    # Only rows with every signal are worth reusing; a degraded verdict (upstream error,
+    # deadline miss, no Gemini answer) would otherwise spread to every paraphrase for good
+    FULLY_SIGNALLED_SQL = ("r.missing_signals IS NULL AND r.gemini_flag IS NOT NULL "
+                           "AND r.rating NOT IN ('API Error', 'Timed Out')")
+
+    def __init__(self, tokenize, lsh=None):
+        """
+        Args:
+            tokenize: Callable(text) -> set of tokens (similarity.tokenize).
+        """
+        self.tokenize = tokenize
+        self.lsh = lsh or MinHashLSH()
+
+    def keys(self, text):
+        """The band keys of text. This is the expensive part (MinHash), so compute it outside any transaction."""
+        return self.lsh.band_keys(self.tokenize(text))
+
+    def index(self, conn, result_id, keys):
+        """Stores one saved text's band keys (from keys()), inside the caller's transaction."""
+        conn.executemany("INSERT OR IGNORE INTO near_dup_bands (band_key, result_id) VALUES (?, ?)",
+                         [(key, result_id) for key in keys])
+
+    def find(self, conn, text, threshold, exclude_hash=None, keys=None):
+        """
+        Finds the saved analysis most similar to text.
+
+        Returns:
+            (row, similarity) for the best fully signalled match with Jaccard similarity
+            >= threshold, or None. Rows with text_hash == exclude_hash (the text itself)
+            are skipped. Pass keys if already computed with keys().
+        """
+        tokens = self.tokenize(text)
+        keys = self.lsh.band_keys(tokens) if keys is None else keys
+        if not keys:
+            return None
+        rows = conn.execute(
+            f"SELECT r.* FROM analysis_results r WHERE r.id IN (SELECT result_id FROM near_dup_bands "
+            f"WHERE band_key IN ({', '.join('?' * len(keys))}) LIMIT {self.MAX_CANDIDATES}) AND {self.FULLY_SIGNALLED_SQL}",
+            keys).fetchall()
+        rows = [row for row in rows if row['text_hash'] != exclude_hash]
+        ranked = QueryMatcher(tokens, min_overlap=1).rank([self.tokenize(row['query_text']) for row in rows], threshold)
+        return (rows[ranked[0][0]], ranked[0][1]) if ranked else None
@@ -0,0 +1,141 @@
+# backend/reputation.py
+import os
+import threading
+import time
+
+TRUSTED_SCORE = 50 # Scores are integers from -100 (known bad) to 100 (fully trusted)
+BAD_SCORE = -50
+
+def normalize_domain(domain):
+    """Lowercased host without port, trailing dot or leading www."""
+    d = (domain or '').strip().lower().rstrip('.')
+    d = d.rsplit('@', 1)[-1].split(':', 1)[0]
+    return d[4:] if d.startswith('www.') else d
+
+# --- Domain Reputation ---
+class DomainReputation:
+    """
+    Graded reputation scores for domains, matched on whole labels: an entry
+    for bbc.com covers news.bbc.com but not evilbbc.com. A lookup tries the
+    host and then each parent suffix (news.bbc.co.uk, bbc.co.uk, co.uk, uk)
+    in one dict, so it costs one hash probe per label however many entries
+    are loaded; the most specific entry wins.
+
+    Entries come from built-in defaults plus an optional list file, which is
+    re-read whenever it changes on disk (checked at most every
+    reload_interval seconds), without a restart. File format, one entry
+    per line, '#' starts a comment:
+
+        bbc.com 100
+        bbc.com trusted          # same as 100
+        fake-news.example bad    # same as -100
+        blogs.example.org -20
+    """
+    WORDS = {'trusted': 100, 'bad': -100, 'neutral': 0}
+
+    def __init__(self, defaults=None, path=None, reload_interval=5.0):
+        """
+        Args:
+            defaults: Mapping of domain -> score (or iterable of trusted domains) always loaded.
+            path: Optional list file layered over the defaults.
+            reload_interval: Seconds between checks of the file's modification time.
+        """
+        if defaults is not None and not isinstance(defaults, dict):
+            defaults = {d: 100 for d in defaults}
+        self.defaults = {normalize_domain(d): self._clamp(s) for d, s in (defaults or {}).items()}
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._scores = dict(self.defaults) # Replaced wholesale on reload, so lookups need no lock
+        self._mtime = None
+        self._checked_at = 0.0
+        self.reloads = 0
+        self.errors = 0
+        self.reload()
+
+    @staticmethod
+    def _clamp(score):
+        return max(-100, min(100, int(round(score)))) # Small ints are shared objects in CPython
+
+    def _parse(self, f):
+        scores = {}
+        for line_no, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            value = parts[1].lower() if len(parts) > 1 else 'trusted'
+            score = self.WORDS.get(value)
+            if score is None:
+                try:
+                    score = float(value)
+                except ValueError:
+                    raise ValueError(f"{self.path}:{line_no}: bad score {parts[1]!r}") from None
+            domain = normalize_domain(parts[0])
+            if domain:
+                scores[domain] = self._clamp(score)
+        return scores
+
+    def reload(self, force=False):
+        """
+        Re-reads the list file if it changed. A file that fails to parse is
+        reported and the previous entries stay in use.
+
+        Returns:
+            True if the entries were replaced.
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if not self.path:
+                return False
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime == self._mtime and not force:
+                return False
+            try:
+                scores = dict(self.defaults)
+                if mtime is not None:
+                    with open(self.path, encoding='utf-8') as f:
+                        scores.update(self._parse(f))
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                print(f"[Reputation] Keeping the previous list: {e}")
+                return False
+            self._scores = scores; self._mtime = mtime; self.reloads += 1
+        print(f"[Reputation] Loaded {len(scores)} domain entries.")
+        return True
+
+    def _maybe_reload(self):
+        if self.path and time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+
+    def score(self, domain):
+        """The most specific entry's score for domain (or any of its parent domains), or None."""
+        self._maybe_reload()
+        scores = self._scores
+        d = normalize_domain(domain)
+        while d:
+            s = scores.get(d)
+            if s is not None:
+                return s
+            d = d.partition('.')[2]
+        return None
+
+    def is_trusted(self, domain):
+        s = self.score(domain)
+        return s is not None and s >= TRUSTED_SCORE
+
+    def is_bad(self, domain):
+        s = self.score(domain)
+        return s is not None and s <= BAD_SCORE
+
+    def stats(self):
+        scores = self._scores
+        return {"entries": len(scores), "trusted": sum(1 for s in scores.values() if s >= TRUSTED_SCORE),
+                "bad": sum(1 for s in scores.values() if s <= BAD_SCORE), "path": self.path,
+                "reloads": self.reloads, "errors": self.errors}
+
+    def __len__(self):
+        return len(self._scores)
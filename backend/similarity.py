@@ -0,0 +1,58 @@
+# backend/similarity.py
+import re
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset({"the", "a", "an", "is", "are", "to", "of", "and", "or", "in", "on", "for", "with"})
+
+def tokenize(s):
+    """The set of lowercased alphanumeric tokens longer than two characters, minus stop words."""
+    return {t for t in TOKEN_RE.findall((s or '').lower()) if len(t) > 2 and t not in STOP_WORDS}
+
+def jaccard(a, b):
+    """Jaccard similarity of two token sets."""
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+# --- Query Matcher ---
+class QueryMatcher:
+    """
+    Scores any number of candidate texts against one query by token Jaccard
+    similarity. The query is tokenized once; each candidate costs one
+    tokenization and one set intersection (done in C), and the union size
+    comes from the set sizes, so no union set is ever built.
+    """
+    def __init__(self, query, min_overlap=2):
+        """
+        Args:
+            query: Query text, or an already tokenized set.
+            min_overlap: Candidates sharing fewer tokens than this score 0.0
+                         (one shared word is not a match, however short the texts).
+        """
+        self.tokens = tokenize(query) if isinstance(query, str) else set(query)
+        self.min_overlap = min_overlap
+
+    def score(self, candidate):
+        """Similarity of one candidate (text or token set) to the query."""
+        tokens = tokenize(candidate) if isinstance(candidate, str) else candidate
+        inter = len(self.tokens & tokens)
+        if inter < max(1, self.min_overlap):
+            return 0.0
+        return inter / (len(self.tokens) + len(tokens) - inter)
+
+    def scores(self, candidates):
+        """Similarity of every candidate, in order."""
+        if not self.tokens:
+            return [0.0 for _ in candidates]
+        return [self.score(c) for c in candidates]
+
+    def rank(self, candidates, threshold=0.0):
+        """
+        Returns:
+            (index, score) for every candidate scoring at least threshold, best first
+            (ties keep candidate order).
+        """
+        ranked = [(i, s) for i, s in enumerate(self.scores(candidates)) if s > 0.0 and s >= threshold]
+        ranked.sort(key=lambda pair: -pair[1])
+        return ranked
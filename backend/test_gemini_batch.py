@@ -0,0 +1,91 @@
+import json
+
+import vri
+from batching import MicroBatcher
+from upstream import RateLimited
+
+
+# --- Stub Gemini client for query_gemini_batch (run with pytest) ---
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _StubModels:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    def generate_content(self, model, contents, config):
+        self.calls.append(contents)
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return _Response(self.reply(contents) if callable(self.reply) else self.reply)
+
+
+class _StubClient:
+    def __init__(self, reply):
+        self.models = _StubModels(reply)
+
+
+def _entry(index, flag=False, confidence=90):
+    return {"index": index, "misinformation_flag": flag, "simulated_confidence_score": confidence,
+            "reasoning_snippet": f"item {index}"}
+
+
+def _single(text):
+    return {"status": "success", "data": {"single": text}}
+
+
+def test_batch_fans_array_out_in_item_order():
+    # Entries may come back in any order; each is matched to its item by index
+    client = _StubClient(json.dumps([_entry(2, confidence=70), _entry(0, flag=True), _entry(1)]))
+    results = vri.query_gemini_batch(["a", "b", "c"], client=client)
+    assert len(client.models.calls) == 1
+    assert [r['status'] for r in results] == ['success'] * 3
+    assert [r['data']['misinformation_flag'] for r in results] == [True, False, False]
+    assert results[2]['data'] == {"misinformation_flag": False, "simulated_confidence_score": 70, "reasoning_snippet": "item 2"}
+    assert all('index' not in r['data'] for r in results)
+
+
+def test_batcher_sends_one_call_for_concurrent_items():
+    client = _StubClient(lambda prompt: json.dumps([_entry(i) for i in range(prompt.count('\n['))]))
+    batcher = MicroBatcher(lambda texts: vri.query_gemini_batch(texts, client=client), _single, max_batch=3, window=1.0)
+    try:
+        futures = [batcher.submit(t) for t in ("a", "b", "c")]
+        results = [f.result(timeout=5) for f in futures]
+    finally:
+        batcher.close()
+    assert len(client.models.calls) == 1
+    assert [r['data']['reasoning_snippet'] for r in results] == ["item 0", "item 1", "item 2"]
+    assert batcher.stats()['batched_items'] == 3 and batcher.stats()['fallbacks'] == 0
+
+
+def test_malformed_or_missing_index_falls_back_to_single_calls():
+    replies = [json.dumps([_entry(0), _entry(0)]), # Duplicate index, item 1 missing
+               json.dumps([_entry(0), {"index": 1}]), # Entry missing required fields
+               json.dumps({"index": 0}), # Not an array
+               "not json"]
+    for reply in replies:
+        client = _StubClient(reply)
+        try:
+            vri.query_gemini_batch(["a", "b"], client=client)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{reply!r} was accepted")
+        batcher = MicroBatcher(lambda texts: vri.query_gemini_batch(texts, client=client), _single, max_batch=2, window=1.0)
+        try:
+            results = [f.result(timeout=5) for f in [batcher.submit("a"), batcher.submit("b")]]
+        finally:
+            batcher.close()
+        assert results == [_single("a"), _single("b")]
+        assert batcher.stats()['fallbacks'] == 1
+
+
+def test_quota_error_applies_to_every_item():
+    client = _StubClient(RateLimited(vri.GEMINI_HOST, 12.0))
+    results = vri.query_gemini_batch(["a", "b", "c"], client=client)
+    assert len(client.models.calls) == 1
+    assert [r['status'] for r in results] == ['rate_limited'] * 3
+    assert all(r['retry_after'] == 12.0 for r in results)
@@ -1,100 +1,121 @@
-import requests
-import re
+import os
 import sys
 
+import requests
+
+from extractor import extract_from_chunks, extract_from_response, compose_article_text
+from upstream import DEFAULT_USER_AGENT
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
 def extract_article_content(article_url):
-    """Test version of extract_article_content"""
+    """Test version of extract_article_content (direct fetch only, with diagnostics)"""
     print(f"\n=== Testing URL: {article_url} ===\n")
-    
+
     try:
-        r = requests.get(article_url, timeout=10, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
+        r = requests.get(article_url, timeout=10, stream=True, headers={'User-Agent': DEFAULT_USER_AGENT})
         print(f"Status Code: {r.status_code}")
-        
+
         if r.status_code == 200:
-            html = r.text or ''
-            print(f"HTML Length: {len(html)} chars\n")
-            
-            # Extract title
-            title = None
-            m = re.search(r'<meta[^>]+property=["\']og:title["\'][^>]+content=["\']([^"\']+)["\']', html, re.IGNORECASE)
-            if m:
-                title = m.group(1).strip()
-                print(f"✓ Found OG Title: {title}")
-            else:
-                m2 = re.search(r'<title[^>]*>(.*?)</title>', html, re.IGNORECASE | re.DOTALL)
-                if m2:
-                    title = m2.group(1).strip()
-                    print(f"✓ Found <title>: {title}")
-            
-            # Extract description
-            description = None
-            m_desc = re.search(r'<meta[^>]+property=["\']og:description["\'][^>]+content=["\']([^"\']+)["\']', html, re.IGNORECASE)
-            if m_desc:
-                description = m_desc.group(1).strip()
-                print(f"✓ Found OG Description: {description[:100]}...")
-            else:
-                m_desc2 = re.search(r'<meta[^>]+name=["\']description["\'][^>]+content=["\']([^"\']+)["\']', html, re.IGNORECASE)
-                if m_desc2:
-                    description = m_desc2.group(1).strip()
-                    print(f"✓ Found meta description: {description[:100]}...")
-            
-            # Extract article body
-            article_body = None
-            article_match = re.search(r'<article[^>]*>(.*?)</article>', html, re.IGNORECASE | re.DOTALL)
-            if article_match:
-                article_html = article_match.group(1)
-                article_html = re.sub(r'<script[^>]*>.*?</script>', '', article_html, flags=re.IGNORECASE | re.DOTALL)
-                article_html = re.sub(r'<style[^>]*>.*?</style>', '', article_html, flags=re.IGNORECASE | re.DOTALL)
-                paragraphs = re.findall(r'<p[^>]*>(.*?)</p>', article_html, re.IGNORECASE | re.DOTALL)
-                
-                if paragraphs:
-                    print(f"✓ Found {len(paragraphs)} paragraphs in <article>")
-                    clean_paras = []
-                    for p in paragraphs[:5]:
-                        clean_p = re.sub(r'<[^>]+>', '', p).strip()
-                        if len(clean_p) > 30:
-                            clean_paras.append(clean_p)
-                            print(f"  - Para: {clean_p[:80]}...")
-                    
-                    if clean_paras:
-                        article_body = ' '.join(clean_paras)
-            else:
-                print("✗ No <article> tag found")
-            
-            # Combine
-            combined_text = []
-            if title:
-                combined_text.append(title)
-            if description and description not in (title or ''):
-                combined_text.append(description)
-            if article_body:
-                if len(article_body) > 1000:
-                    article_body = article_body[:1000] + '...'
-                combined_text.append(article_body)
-            
-            if combined_text:
-                full_text = ' | '.join(combined_text)
+            result = extract_from_response(r)
+            print(f"Bytes read: {result['bytes_read']}"
+                  f"{' (stopped early)' if result.get('stopped_early') else ''}{' (capped)' if result.get('truncated') else ''}")
+            if result['status'] == 'success':
                 print(f"\n=== FINAL EXTRACTED CONTENT ===")
-                print(f"Length: {len(full_text)} chars")
-                print(f"Content: {full_text[:300]}...")
-                return {"status": "success", "content": full_text, "title": title}
-            else:
-                print("\n✗ No content extracted")
-                
+                print(f"Length: {len(result['content'])} chars")
+                print(f"Content: {result['content'][:300]}...")
+                return result
+            print("\n✗ No content extracted")
+        else:
+            r.close()
+
     except Exception as e:
         print(f"✗ Error: {e}")
-    
+
     return {"status": "not_found", "message": "Could not extract content"}
 
 
+# --- Fixture-based tests for the streaming extractor (run with pytest) ---
+def _load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def _chunked(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def test_og_fields_and_first_paragraphs():
+    result = extract_from_chunks(_chunked(_load_fixture('og_article.html'), 64))
+    assert result['status'] == 'success'
+    assert result['title'] == "Scientists confirm water found on the Moon's sunlit surface"
+    title, description, body = result['content'].split(' | ')
+    assert title == result['title']
+    assert description == "NASA's SOFIA observatory detected water molecules in Clavius Crater."
+    assert body.startswith("NASA’s Stratospheric Observatory")
+    assert "12-ounce bottle" in body # Text inside inline tags is kept
+    assert "By Staff" not in body # Short paragraphs are dropped
+    assert "script" not in body
+    assert "sixth paragraph" not in body
+    assert "navigation" not in body and "footer" not in body
+
+
+def test_title_and_meta_description_fallbacks():
+    result = extract_from_chunks([_load_fixture('no_article.html')])
+    assert result['status'] == 'success'
+    assert result['content'] == ("Government announces new plastic ban starting next month | "
+                                 "The ban covers single-use plastic bags, straws and cutlery.")
+
+
+def test_stops_reading_once_article_is_complete():
+    consumed = []
+
+    def endless_page():
+        for chunk in _chunked(_load_fixture('og_article.html'), 128):
+            consumed.append(chunk); yield chunk
+        while True: # A page that never ends after the article
+            consumed.append(b'x'); yield b'<div>' + b'filler ' * 1000 + b'</div>'
+
+    result = extract_from_chunks(endless_page(), max_bytes=10 * 1024 * 1024)
+    assert result['status'] == 'success'
+    assert result['stopped_early'] and not result['truncated']
+    assert len(consumed) < 50
+
+
+def test_byte_cap_bounds_reading():
+    page = b'<html><head><title>Huge page</title></head><body>' + b'<div>junk</div>' * 200000
+    result = extract_from_chunks(_chunked(page, 4096), max_bytes=64 * 1024)
+    assert result['bytes_read'] == 64 * 1024
+    assert result['truncated']
+    assert result['content'] == 'Huge page'
+
+
+def test_multibyte_characters_split_across_chunks():
+    page = '<title>Café owner says “record” crowds</title>'.encode('utf-8')
+    result = extract_from_chunks(_chunked(page, 1), encoding='utf-8')
+    assert result['title'] == 'Café owner says “record” crowds'
+
+
+def test_no_content_is_not_found():
+    result = extract_from_chunks([b'<html><body><div></div></body></html>'])
+    assert result['status'] == 'not_found'
+
+
+def test_compose_truncates_long_body():
+    text = compose_article_text('Title', 'Title', 'word ' * 400)
+    title, body = text.split(' | ')
+    assert title == 'Title' # Description contained in the title is skipped
+    assert len(body) == 1003 and body.endswith('...')
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         url = sys.argv[1]
     else:
         url = input("Enter a news URL to test: ")
-    
+
     result = extract_article_content(url)
     print(f"\n=== RESULT ===")
     print(result)
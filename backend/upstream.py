@@ -0,0 +1,332 @@
+# backend/upstream.py
+import datetime
+import random
+import threading
+import time
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+RETRY_STATUSES = {500, 502, 503, 504}
+
+class RateLimited(requests.exceptions.RequestException):
+    """Raised when an upstream's quota would make the caller wait too long."""
+    def __init__(self, host, retry_after):
+        super().__init__(f"Rate limit for {host}; retry in {retry_after:.1f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+def parse_retry_after(value):
+    """Parses a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.datetime.now(when.tzinfo)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+# --- Adaptive Token Bucket ---
+class TokenBucket:
+    """
+    Token-bucket rate limiter for one upstream that adapts to throttling.
+    A 429 halves the refill rate and blocks the bucket until Retry-After;
+    each success then adds back a small step until the configured quota is reached.
+    """
+    def __init__(self, rate, burst=None, min_rate=None, recovery=0.05):
+        """
+        Args:
+            rate: Configured quota in requests per second.
+            burst: Bucket capacity (defaults to one second's worth, at least 1).
+            min_rate: Floor the rate never drops below after repeated 429s.
+            recovery: Fraction of the quota restored per successful request.
+        """
+        self.max_rate = float(rate)
+        self.rate = self.max_rate
+        self.min_rate = float(min_rate) if min_rate else self.max_rate / 16
+        self.capacity = float(burst or max(1.0, self.max_rate))
+        self.recovery = recovery
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, max_wait=None):
+        """
+        Takes one token, sleeping until it is available.
+
+        Returns:
+            0 on success, or the wait in seconds that would have exceeded max_wait
+            (in which case no token is taken).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self.blocked_until - now)
+            if self.tokens < 1:
+                wait = max(wait, (1 - self.tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return wait
+            self.tokens -= 1 # May go negative: later callers queue up behind this reservation
+        if wait:
+            time.sleep(wait)
+        return 0
+
+    def on_throttled(self, retry_after=None):
+        """Backs off after a 429: multiplicative decrease plus an explicit pause."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate / 2)
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
+            self.tokens = min(self.tokens, 0.0)
+
+    def on_success(self):
+        """Additive increase back toward the configured quota."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery)
+
+    def snapshot(self):
+        with self._lock:
+            return {"quota_rps": self.max_rate, "current_rps": round(self.rate, 3),
+                    "blocked_for_s": round(max(0.0, self.blocked_until - time.monotonic()), 1)}
+
+# --- Per-Host Latency Stats ---
+class HostStats:
+    """Running request/latency counters for one upstream host."""
+    def __init__(self, window=200):
+        self.requests = 0
+        self.failures = 0 # Exceptions or 5xx after the last retry
+        self.retries = 0
+        self.throttled = 0 # 429 responses seen
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent = deque(maxlen=window) # Latest latencies, for percentiles
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms, ok):
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.failures += 1
+            self.total_ms += latency_ms
+            self.max_ms = max(self.max_ms, latency_ms)
+            self.recent.append(latency_ms)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_throttled(self):
+        with self._lock:
+            self.throttled += 1
+
+    def _percentile(self, pct):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))], 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests, "failures": self.failures, "retries": self.retries,
+                "throttled": self.throttled,
+                "avg_ms": round(self.total_ms / self.requests, 1) if self.requests else None,
+                "p50_ms": self._percentile(0.50), "p95_ms": self._percentile(0.95),
+                "max_ms": round(self.max_ms, 1),
+            }
+
+# --- Shared Upstream Client ---
+class UpstreamClient:
+    """
+    One pooled HTTP session shared by every upstream call.
+    Connections are kept alive in a bounded pool per host, idempotent requests
+    are retried with jittered exponential backoff on 5xx and connection errors,
+    and per-host latency is recorded for tuning.
+    """
+    def __init__(self, pool_hosts=32, pool_maxsize=10, max_retries=2, backoff_base=0.5,
+                 backoff_cap=8.0, user_agent=DEFAULT_USER_AGENT, max_tracked_hosts=256,
+                 rate_limits=None, max_throttle_wait=5.0):
+        """
+        Args:
+            pool_hosts: How many per-host connection pools to keep around.
+            pool_maxsize: Max open connections per host; extra callers wait for one.
+            max_retries: Retries after the first attempt (0 disables retrying).
+            backoff_base: First backoff ceiling in seconds; doubles every retry.
+            backoff_cap: Upper bound on any single backoff.
+            rate_limits: {host: requests per second} quotas enforced by token buckets.
+            max_throttle_wait: Longest a caller sleeps for a token or Retry-After;
+                               beyond that RateLimited is raised so the job can be delayed.
+        """
+        self.limiters = {host: TokenBucket(rps) for host, rps in (rate_limits or {}).items() if rps}
+        self.max_throttle_wait = max_throttle_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_tracked_hosts = max_tracked_hosts
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_maxsize, pool_block=True, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['User-Agent'] = user_agent
+        self._stats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _host_stats(self, host):
+        with self._lock:
+            stats = self._stats.get(host)
+            if stats is None:
+                stats = self._stats[host] = HostStats()
+                # Publisher hosts are unbounded, so keep only the most recently used ones
+                while len(self._stats) > self.max_tracked_hosts:
+                    self._stats.popitem(last=False)
+            else:
+                self._stats.move_to_end(host)
+            return stats
+
+    def _backoff(self, attempt):
+        """Full-jitter exponential backoff for the given retry number (0-based)."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method, url, retries=None, **kwargs):
+        """
+        Sends a request through the shared session.
+
+        Args:
+            method: HTTP method. Only GET/HEAD are retried.
+            url: Full request URL.
+            retries: Overrides max_retries for this call.
+            **kwargs: Passed through to requests (params, headers, timeout, stream...).
+
+        Returns:
+            The final requests.Response (which may still be a 5xx or a 429).
+
+        Raises:
+            RateLimited if the host's quota needs a longer wait than max_throttle_wait.
+            requests.exceptions.RequestException from the last attempt.
+        """
+        host = urlparse(url).hostname or url
+        stats = self._host_stats(host)
+        limiter = self.limiters.get(host)
+        retries = self.max_retries if retries is None else retries
+        if method.upper() not in ('GET', 'HEAD'):
+            retries = 0
+        attempt = 0
+        while True:
+            self.throttle(host)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                latency_ms = (time.perf_counter() - start) * 1000
+                if attempt < retries:
+                    stats.record_retry()
+                    delay = self._backoff(attempt); attempt += 1
+                    print(f"[Upstream] {host} connection error ({e.__class__.__name__}), retry {attempt} in {delay:.2f}s")
+                    time.sleep(delay)
+                    continue
+                stats.record(latency_ms, ok=False)
+                raise
+            except Exception:
+                stats.record((time.perf_counter() - start) * 1000, ok=False)
+                raise
+            latency_ms = (time.perf_counter() - start) * 1000
+            if response.status_code == 429:
+                stats.record_throttled()
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if limiter:
+                    limiter.on_throttled(retry_after)
+                # Short waits are absorbed here (throttle() sleeps them off); long ones go back to the caller
+                if attempt < retries and (retry_after or 0) <= self.max_throttle_wait:
+                    stats.record_retry()
+                    if not limiter: # Nothing paces the retry for us; never resend at once to a host that just throttled us
+                        retry_after = retry_after or self._backoff(attempt)
+                    attempt += 1
+                    print(f"[Upstream] {host} returned 429, retry {attempt} after {retry_after or 0:.1f}s")
+                    response.close()
+                    if not limiter:
+                        time.sleep(retry_after)
+                    continue
+                stats.record(latency_ms, ok=False)
+                return response
+            if response.status_code in RETRY_STATUSES and attempt < retries:
+                stats.record_retry()
+                delay = self._backoff(attempt); attempt += 1
+                print(f"[Upstream] {host} returned {response.status_code}, retry {attempt} in {delay:.2f}s")
+                response.close()
+                time.sleep(delay)
+                continue
+            if limiter and response.status_code < 500:
+                limiter.on_success()
+            stats.record(latency_ms, ok=response.status_code < 500)
+            return response
+
+    def throttle(self, host):
+        """Waits for a token from host's limiter (if any).
+
+        Raises:
+            RateLimited if the wait would exceed max_throttle_wait.
+        """
+        limiter = self.limiters.get(host)
+        if limiter is None:
+            return
+        wait = limiter.acquire(max_wait=self.max_throttle_wait)
+        if wait:
+            raise RateLimited(host, wait)
+
+    def throttled(self, host, retry_after=None):
+        """Reports a 429 seen outside this session (e.g. an SDK error)."""
+        self._host_stats(host).record_throttled()
+        limiter = self.limiters.get(host)
+        if limiter:
+            limiter.on_throttled(retry_after)
+
+    def retry_after(self, host):
+        """Seconds until host's limiter expects to have capacity again."""
+        limiter = self.limiters.get(host)
+        if limiter is None:
+            return 0.0
+        snap = limiter.snapshot()
+        return max(snap['blocked_for_s'], 1.0 / max(limiter.rate, 1e-6))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    @contextmanager
+    def track(self, host):
+        """Rate-limits and records latency for calls made outside this session (e.g. SDK clients)."""
+        self.throttle(host)
+        stats = self._host_stats(host)
+        start = time.perf_counter(); ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            stats.record((time.perf_counter() - start) * 1000, ok)
+
+    def stats(self):
+        """Returns a {host: stats dict} snapshot, including limiter state for rate-limited hosts."""
+        with self._lock:
+            snapshot = {host: s.snapshot() for host, s in self._stats.items()}
+        for host, limiter in self.limiters.items():
+            snapshot.setdefault(host, {})['rate_limit'] = limiter.snapshot()
+        return snapshot
+
+    def close(self):
+        self.session.close()
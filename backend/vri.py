@@ -1,7 +1,10 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 import os
+import sys
 import time
 import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import requests
 # Robust config import: fall back to env vars if config.py missing
 try:
@@ -13,9 +16,26 @@ except Exception:
         NEWS_API_KEY = os.environ.get('NEWS_API_KEY')
         GNEWS_API_KEY = os.environ.get('GNEWS_API_KEY')
     config = _Cfg()
+
+def _setting(name, default):
+    """Reads a tunable from config.py, then the environment, falling back to default."""
+    value = getattr(config, name, None)
+    if value is None:
+        value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        if isinstance(default, bool):
+            return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+        if isinstance(default, dict) and isinstance(value, str):
+            return dict(json.loads(value))
+        return type(default)(value)
+    except (TypeError, ValueError): # json.JSONDecodeError is a ValueError
+        print(f"[WARN] Invalid value for {name}: {value!r}. Using {default!r}.")
+        return default
 import sqlite3
 import datetime
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlsplit, urlunsplit, unquote_plus
 try:
     from google import genai
     from google.genai import types
@@ -28,7 +48,17 @@ import hashlib
 import re
 
 # --- Import DSA components ---
-from dsa import MerkleTree, job_queue, seen_hashes 
+from dsa import MerkleTree, TTLCache, BloomFilter, job_queue, fetch_queue, job_registry, seen_index
+from upstream import UpstreamClient, RateLimited, parse_retry_after
+from cache import FactCheckCache, GeminiCache, ArticleCache
+from batching import MicroBatcher
+from db import Database, GroupCommitWriter, split_statements
+from durable_queue import DurableJobQueue
+from neardup import NearDuplicateIndex
+from claims import ClaimIndex
+from similarity import QueryMatcher, tokenize
+from reputation import DomainReputation, TRUSTED_SCORE, BAD_SCORE
+from extractor import extract_from_response
 
 # --- Gemini Client Initialization ---
 GEMINI_CLIENT = None
@@ -39,6 +69,22 @@ except Exception as e:
     print(f"[ERROR] Failed to initialize Gemini Client: {e}")
 # ------------------------------------
 
+# --- Shared Upstream HTTP Client ---
+GEMINI_HOST = 'generativelanguage.googleapis.com' # SDK-managed; only latency and quota are tracked
+# Requests per second per upstream host; tune to your plan's quotas
+RATE_LIMITS = _setting('RATE_LIMITS', {
+    'factchecktools.googleapis.com': 5.0, 'gnews.io': 1.0, 'newsapi.org': 1.0, GEMINI_HOST: 2.0,
+})
+RATE_LIMIT_MAX_REQUEUES = _setting('RATE_LIMIT_MAX_REQUEUES', 5) # Delayed retries before accepting a degraded result
+RATE_LIMIT_MAX_DELAY = _setting('RATE_LIMIT_MAX_DELAY', 120.0) # Cap on a single delay, in seconds
+# Keep-alive pools per host, jittered retries and token-bucket quotas; every outbound HTTP call goes through it
+UPSTREAM = UpstreamClient(
+    pool_maxsize=_setting('UPSTREAM_POOL_SIZE', 10),
+    max_retries=_setting('UPSTREAM_MAX_RETRIES', 2),
+    backoff_base=_setting('UPSTREAM_BACKOFF_BASE', 0.5),
+    rate_limits=RATE_LIMITS,
+    max_throttle_wait=_setting('RATE_LIMIT_MAX_WAIT', 5.0))
+
 # --- Setup ---
 TEMPLATE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'frontend'))
 STATIC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'frontend'))
@@ -46,6 +92,15 @@ app = Flask(__name__, template_folder=TEMPLATE_DIR, static_url_path='', static_f
 
 # --- Database & Config ---
 DB_FILE = os.path.join(os.path.dirname(__file__), 'vri.db')
+DB = Database(DB_FILE,
+              busy_timeout_ms=_setting('DB_BUSY_TIMEOUT_MS', 5000),
+              cache_size_kib=_setting('DB_CACHE_SIZE_KIB', 16 * 1024),
+              synchronous=_setting('DB_SYNCHRONOUS', 'NORMAL'),
+              pool_size=_setting('DB_POOL_SIZE', 8)) # Idle connections kept for request threads
+DB_WRITE_BATCH = _setting('DB_WRITE_BATCH', 64) # Most results committed in one transaction
+DB_WRITE_MAX_LATENCY = _setting('DB_WRITE_MAX_LATENCY', 0.05) # Seconds a result waits for its batch to fill
+DB_WRITE_TIMEOUT = _setting('DB_WRITE_TIMEOUT', 30.0) # How long a worker waits for its commit
+RESULT_WRITER = None # Created by start_workers() / start_result_writer()
 FALSE_RATINGS = ['false', 'pants on fire', 'mostly false', 'scam', 'fake', 'incorrect', 'not true', 'debunked']
 TRUE_RATINGS = ['true', 'mostly true', 'correct attribution', 'accurate', 'correct', 'verified']
 
@@ -56,13 +111,183 @@ TRUSTED_DOMAINS = {
     'latimes.com', 'hindustantimes.com', 'thehindu.com', 'timesofindia.indiatimes.com',
     'financialexpress.com', 'business-standard.com'
 }
+# Graded scores (-100..100) layered over TRUSTED_DOMAINS from an optional list file, re-read when it changes
+DOMAIN_REPUTATION = DomainReputation(
+    TRUSTED_DOMAINS,
+    path=_setting('DOMAIN_REPUTATION_FILE', os.path.join(os.path.dirname(__file__), 'domain_reputation.txt')),
+    reload_interval=_setting('DOMAIN_REPUTATION_RELOAD', 5.0))
 
-def init_database():
-    """Initializes the SQLite database and table."""
-    print("Initializing database...")
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
+# --- Fact Check Cache Config ---
+CACHE_DB_FILE = os.path.join(os.path.dirname(__file__), 'cache.db')
+FACT_CHECK_CACHE = FactCheckCache(
+    max_size=_setting('FACT_CHECK_CACHE_SIZE', 2048),
+    ttl=_setting('FACT_CHECK_CACHE_TTL', 6 * 3600.0),
+    negative_ttl=_setting('FACT_CHECK_CACHE_NEGATIVE_TTL', 1800.0), # "Not Found" may change once fact-checkers publish
+    db_path=CACHE_DB_FILE if _setting('FACT_CHECK_CACHE_PERSIST', False) else None)
+
+# Every claim the API returns is indexed locally; decisive local matches skip the API call
+CLAIM_INDEX = ClaimIndex(CACHE_DB_FILE, tokenize) if _setting('CLAIM_INDEX_ENABLED', True) else None
+
+# --- Gemini Verdict Cache Config ---
+GEMINI_MODEL = 'gemini-2.5-flash'
+GEMINI_PROMPT_VERSION = 1 # Bump whenever the prompt or schema changes so old verdicts stop matching
+GEMINI_CACHE = GeminiCache(
+    max_size=_setting('GEMINI_CACHE_SIZE', 4096),
+    max_age=_setting('GEMINI_CACHE_MAX_AGE', 7 * 24 * 3600.0), # Older verdicts are stale and re-analyzed
+    db_path=CACHE_DB_FILE if _setting('GEMINI_CACHE_PERSIST', True) else None)
+
+# Batched mode: concurrent cache misses share one generate_content call (1 disables batching)
+GEMINI_BATCH_SIZE = _setting('GEMINI_BATCH_SIZE', 1)
+GEMINI_BATCH_WINDOW = _setting('GEMINI_BATCH_WINDOW', 0.05) # Seconds to wait for a batch to fill
+GEMINI_BATCHER = None # Created by start_workers() when batching is enabled
+
+# --- Article Extraction Config ---
+EXTRACT_MAX_BYTES = _setting('EXTRACT_MAX_BYTES', 2 * 1024 * 1024) # Never read more than this per page
+EXTRACT_MAX_SECONDS = _setting('EXTRACT_MAX_SECONDS', 15.0) # Wall-clock budget for streaming one page
+EXTRACT_HEDGED = _setting('EXTRACT_HEDGED', True) # Race news-API fallbacks against a slow direct fetch
+EXTRACT_HEDGE_DELAY = _setting('EXTRACT_HEDGE_DELAY', 2.0) # Seconds the direct fetch gets on its own
+ARTICLE_CACHE = ArticleCache(
+    CACHE_DB_FILE,
+    max_bytes=_setting('ARTICLE_CACHE_MAX_BYTES', 32 * 1024 * 1024), # LRU-evicted past this many bytes of text
+    freshness=_setting('ARTICLE_CACHE_FRESHNESS', 3600.0)) # Served without any network call while younger than this
+
+# --- Worker Pool Config ---
+WORKER_COUNT = _setting('WORKER_COUNT', 4) # Number of analysis worker threads
+SHUTDOWN_TIMEOUT = _setting('SHUTDOWN_TIMEOUT', 30.0) # Seconds to wait for queued jobs on shutdown
+JOB_DEADLINE = _setting('JOB_DEADLINE', 25.0) # Seconds to wait for Fact Check + Gemini per job
+FETCH_WORKER_COUNT = _setting('FETCH_WORKER_COUNT', 2) # Threads dedicated to URL fetch/extraction
+LONG_POLL_MAX = _setting('LONG_POLL_MAX', 30.0) # Longest a /api/jobs/<id>?wait= request is held open
+HISTORY_PAGE_SIZE = _setting('HISTORY_PAGE_SIZE', 50) # Default /api/history page size
+HISTORY_MAX_PAGE_SIZE = _setting('HISTORY_MAX_PAGE_SIZE', 200)
+HISTORY_PREVIEW_CHARS = _setting('HISTORY_PREVIEW_CHARS', 240) # query_text is cut to this in history lists
+SEARCH_PAGE_SIZE = _setting('SEARCH_PAGE_SIZE', 20)
+SEARCH_WEIGHTS = '4.0, 1.0, 0.5' # bm25 column weights: claim text, Gemini reasoning, publisher
+STATS_CACHE = TTLCache(max_size=1, ttl=_setting('STATS_CACHE_TTL', 1.0)) # Absorbs many tabs polling /api/stats at once
+SSE_KEEPALIVE = _setting('SSE_KEEPALIVE', 15.0) # Seconds between keep-alive comments on idle event streams
+BATCH_MAX_ITEMS = _setting('BATCH_MAX_ITEMS', 5000) # Largest /api/analyze_batch request accepted
+BATCH_STREAM_TIMEOUT = _setting('BATCH_STREAM_TIMEOUT', 900.0) # Longest a batch response stays open
+NEAR_DUP_THRESHOLD = _setting('NEAR_DUP_THRESHOLD', 0.8) # Token Jaccard at which a text reuses an earlier verdict; 0 disables
+NEAR_DUP_BACKFILL_BATCH = _setting('NEAR_DUP_BACKFILL_BATCH', 200) # History rows indexed per short write transaction
+SEEN_INDEX_CAPACITY = _setting('SEEN_INDEX_CAPACITY', 1_000_000) # Hashes the duplicate filter is sized for (grows on restart)
+SEEN_INDEX_ERROR_RATE = _setting('SEEN_INDEX_ERROR_RATE', 0.001) # Filter hits needing a wasted DB lookup
+JOB_QUEUE_DURABLE = _setting('JOB_QUEUE_DURABLE', True) # Keep both stage queues in the jobs table (survives restarts)
+JOB_LEASE_TIMEOUT = _setting('JOB_LEASE_TIMEOUT', 300.0) # Seconds before a job held by a dead worker is handed out again
+JOB_MAX_ATTEMPTS = _setting('JOB_MAX_ATTEMPTS', 3) # Crashed or failed attempts before a job is dead-lettered
+JOB_POLL_INTERVAL = _setting('JOB_POLL_INTERVAL', 0.5) # How often idle workers look for jobs queued by other processes
+if JOB_QUEUE_DURABLE: # Replaces dsa's in-memory queues; several server/worker processes can share these
+    fetch_queue = DurableJobQueue(DB, 'fetch', visibility_timeout=JOB_LEASE_TIMEOUT,
+                                  max_attempts=JOB_MAX_ATTEMPTS, poll_interval=JOB_POLL_INTERVAL)
+    job_queue = DurableJobQueue(DB, 'analysis', visibility_timeout=JOB_LEASE_TIMEOUT,
+                                max_attempts=JOB_MAX_ATTEMPTS, poll_interval=JOB_POLL_INTERVAL)
+worker_threads = []
+fetch_threads = []
+# Shared pool for the concurrent per-job upstream calls (two per in-flight job)
+UPSTREAM_EXECUTOR = ThreadPoolExecutor(max_workers=max(2, WORKER_COUNT * 2), thread_name_prefix='Upstream')
+# Separate pool for hedged extraction (up to three sources per fetch worker), so it never starves the above
+EXTRACT_EXECUTOR = ThreadPoolExecutor(max_workers=max(3, FETCH_WORKER_COUNT * 3), thread_name_prefix='Extract')
+
+# --- Schema Migrations ---
+def _add_missing_signals(conn):
+    # Databases created before versioning may already have the column
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(analysis_results)").fetchall()]
+    if 'missing_signals' not in columns:
+        conn.execute("ALTER TABLE analysis_results ADD COLUMN missing_signals TEXT NULL")
+
+def _create_search_index(conn):
+    # External-content FTS5 table: the text lives once, in analysis_results
+    try:
+        conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS analysis_fts USING fts5(
+            query_text, gemini_reasoning, publisher,
+            content='analysis_results', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""")
+    except sqlite3.OperationalError as e:
+        print(f"[DB] FTS5 unavailable ({e}); /api/search will fall back to LIKE matching.")
+        return
+    for statement in split_statements('''
+    CREATE TRIGGER IF NOT EXISTS trg_fts_insert AFTER INSERT ON analysis_results BEGIN
+        INSERT INTO analysis_fts (rowid, query_text, gemini_reasoning, publisher)
+            VALUES (NEW.id, NEW.query_text, NEW.gemini_reasoning, NEW.publisher);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_fts_delete AFTER DELETE ON analysis_results BEGIN
+        INSERT INTO analysis_fts (analysis_fts, rowid, query_text, gemini_reasoning, publisher)
+            VALUES ('delete', OLD.id, OLD.query_text, OLD.gemini_reasoning, OLD.publisher);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_fts_update AFTER UPDATE OF query_text, gemini_reasoning, publisher ON analysis_results BEGIN
+        INSERT INTO analysis_fts (analysis_fts, rowid, query_text, gemini_reasoning, publisher)
+            VALUES ('delete', OLD.id, OLD.query_text, OLD.gemini_reasoning, OLD.publisher);
+        INSERT INTO analysis_fts (rowid, query_text, gemini_reasoning, publisher)
+            VALUES (NEW.id, NEW.query_text, NEW.gemini_reasoning, NEW.publisher);
+    END;
+    INSERT INTO analysis_fts (analysis_fts) VALUES ('rebuild')
+    '''):
+        conn.execute(statement)
+
+def _create_near_dup_index(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(analysis_results)").fetchall()]
+    if 'duplicate_of' not in columns:
+        conn.execute("ALTER TABLE analysis_results ADD COLUMN duplicate_of INTEGER NULL")
+    for statement in split_statements('''
+    CREATE TABLE IF NOT EXISTS near_dup_bands (
+        band_key INTEGER NOT NULL, result_id INTEGER NOT NULL, PRIMARY KEY (band_key, result_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_near_dup_result ON near_dup_bands (result_id);
+    CREATE TRIGGER IF NOT EXISTS trg_near_dup_delete AFTER DELETE ON analysis_results BEGIN
+        DELETE FROM near_dup_bands WHERE result_id = OLD.id;
+    END;
+    CREATE TABLE IF NOT EXISTS near_dup_backfill (
+        id INTEGER PRIMARY KEY CHECK (id = 1), next_id INTEGER NOT NULL, upto INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO near_dup_backfill (id, next_id, upto) SELECT 1, 0, COALESCE(MAX(id), 0) FROM analysis_results
+    '''):
+        conn.execute(statement)
+    # Existing history is indexed later by backfill_near_dup_index(), outside this transaction
+
+def backfill_near_dup_index(batch_size=None):
+    """Indexes the history saved before migration v7, one batch at a time.
+
+    Band keys are computed outside any transaction; each batch's INSERTs and
+    its progress mark then commit in one short transaction, so the write lock
+    is only held briefly. An interrupted backfill resumes where it stopped, and
+    processes running it at the same time only repeat idempotent INSERTs.
+    Rows saved since v7 are indexed as they are written.
+
+    Returns:
+        The number of rows indexed.
+    """
+    batch_size = batch_size or NEAR_DUP_BACKFILL_BATCH
+    conn = DB.connect(); indexed = 0
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'near_dup_backfill'").fetchone() is None:
+        return 0
+    while True:
+        state = conn.execute("SELECT next_id, upto FROM near_dup_backfill WHERE id = 1").fetchone()
+        if state is None or state['next_id'] > state['upto']:
+            break
+        rows = conn.execute("SELECT id, query_text FROM analysis_results WHERE id >= ? AND id <= ? ORDER BY id LIMIT ?",
+                            (state['next_id'], state['upto'], batch_size)).fetchall()
+        keyed = [(row['id'], NEAR_DUPES.keys(row['query_text'])) for row in rows]
+        next_id = rows[-1]['id'] + 1 if rows else state['upto'] + 1
+        with DB.transaction() as conn:
+            for result_id, keys in keyed:
+                NEAR_DUPES.index(conn, result_id, keys)
+            conn.execute("UPDATE near_dup_backfill SET next_id = MAX(next_id, ?) WHERE id = 1", (next_id,))
+        indexed += len(rows)
+    if indexed:
+        print(f"[NearDup] Backfilled band keys for {indexed} earlier result(s).")
+    return indexed
+
+def start_near_dup_backfill():
+    """Runs backfill_near_dup_index() on a background thread (a no-op once the history is indexed)."""
+    def run():
+        try:
+            backfill_near_dup_index()
+        except Exception as e:
+            print(f"[NearDup] Backfill stopped: {e}") # Resumes from its progress mark on the next start
+    t = threading.Thread(target=run, name='NearDupBackfill', daemon=True)
+    t.start()
+    return t
+
+# (version, description, SQL script or callable). Append only; never edit a released step.
+MIGRATIONS = [
+    (1, "analysis_results table", '''
     CREATE TABLE IF NOT EXISTS analysis_results (
         id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, query_text TEXT NOT NULL,
         text_hash TEXT NOT NULL UNIQUE, api_result_found BOOLEAN, rating TEXT,
@@ -70,10 +295,67 @@ def init_database():
         gemini_flag BOOLEAN NULL, gemini_confidence INTEGER NULL, gemini_reasoning TEXT NULL,
         final_verdict TEXT NULL
     )
-    ''')
-    conn.commit()
-    conn.close()
-    print("Database initialized successfully.")
+    '''),
+    (2, "missing_signals column", _add_missing_signals),
+    (3, "indexes on final_verdict, domain and timestamp", '''
+    CREATE INDEX IF NOT EXISTS idx_results_final_verdict ON analysis_results (final_verdict);
+    CREATE INDEX IF NOT EXISTS idx_results_domain ON analysis_results (domain);
+    CREATE INDEX IF NOT EXISTS idx_results_timestamp ON analysis_results (timestamp)
+    '''),
+    # Triggers keep the counters in the same transaction as every insert, verdict update and delete
+    (4, "stats_counters table maintained by triggers", '''
+    CREATE TABLE IF NOT EXISTS stats_counters (
+        id INTEGER PRIMARY KEY CHECK (id = 1), total INTEGER NOT NULL, verified_true INTEGER NOT NULL,
+        flagged_false INTEGER NOT NULL, version INTEGER NOT NULL
+    );
+    INSERT OR REPLACE INTO stats_counters (id, total, verified_true, flagged_false, version)
+        SELECT 1, COUNT(*), COALESCE(SUM(final_verdict IS 'VERIFIED_TRUE'), 0),
+               COALESCE(SUM(final_verdict IS 'FLAGGED_FALSE'), 0), 1 FROM analysis_results;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_insert AFTER INSERT ON analysis_results BEGIN
+        UPDATE stats_counters SET total = total + 1,
+            verified_true = verified_true + (NEW.final_verdict IS 'VERIFIED_TRUE'),
+            flagged_false = flagged_false + (NEW.final_verdict IS 'FLAGGED_FALSE'),
+            version = version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_delete AFTER DELETE ON analysis_results BEGIN
+        UPDATE stats_counters SET total = total - 1,
+            verified_true = verified_true - (OLD.final_verdict IS 'VERIFIED_TRUE'),
+            flagged_false = flagged_false - (OLD.final_verdict IS 'FLAGGED_FALSE'),
+            version = version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_stats_update AFTER UPDATE OF final_verdict ON analysis_results
+    WHEN OLD.final_verdict IS NOT NEW.final_verdict BEGIN
+        UPDATE stats_counters SET
+            verified_true = verified_true - (OLD.final_verdict IS 'VERIFIED_TRUE') + (NEW.final_verdict IS 'VERIFIED_TRUE'),
+            flagged_false = flagged_false - (OLD.final_verdict IS 'FLAGGED_FALSE') + (NEW.final_verdict IS 'FLAGGED_FALSE'),
+            version = version + 1 WHERE id = 1;
+    END
+    '''),
+    (5, "analysis_fts full-text index kept in sync by triggers", _create_search_index),
+    (6, "jobs table backing the durable stage queues", '''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NULL, stage TEXT NOT NULL, payload TEXT NOT NULL,
+        state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, available_at REAL NOT NULL,
+        lease_owner TEXT NULL, lease_expires_at REAL NULL, last_error TEXT NULL,
+        created_at REAL NOT NULL, updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (stage, state, available_at);
+    CREATE INDEX IF NOT EXISTS idx_jobs_expiry ON jobs (stage, state, lease_expires_at);
+    CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (lease_owner);
+    CREATE INDEX IF NOT EXISTS idx_jobs_job_id ON jobs (job_id)
+    '''),
+    (7, "near_dup_bands LSH index and duplicate_of column", _create_near_dup_index),
+]
+
+def search_index_available():
+    row = DB.connect().execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'analysis_fts'").fetchone()
+    return row is not None
+
+def init_database():
+    """Initializes the SQLite database: WAL mode plus any pending schema migrations."""
+    print("Initializing database...")
+    version = DB.migrate(MIGRATIONS)
+    print(f"Database initialized successfully (schema v{version}).")
 
 # --- Central Decision Logic ---
 def determine_final_verdict(fc_rating, g_flag, g_conf, domain=None):
@@ -91,12 +373,17 @@ def determine_final_verdict(fc_rating, g_flag, g_conf, domain=None):
             c = int(g_conf)
         except Exception:
             c = 0
-        is_trusted = any(dom.endswith(td) for td in TRUSTED_DOMAINS)
-        if is_trusted:
+        reputation = DOMAIN_REPUTATION.score(dom) if dom else None
+        if reputation is not None and reputation >= TRUSTED_SCORE:
             # Do not flag trusted domains as false purely via AI; require human rating.
             if g_flag is False and c >= 60:
                 return "VERIFIED_TRUE", "Trusted source and AI suggests credibility."
             return "INCONCLUSIVE", "Trusted source with no corroborating fact-check."
+        elif reputation is not None and reputation <= BAD_SCORE:
+            # Known-bad source: weaker AI evidence is enough to flag, and never enough to verify.
+            if g_flag is True and c >= 60:
+                return "FLAGGED_FALSE", "Low-reputation source and AI suggests misinformation."
+            return "INCONCLUSIVE", "Low-reputation source with no corroborating fact-check."
         else:
             if g_flag is True and c >= 85:
                 return "FLAGGED_FALSE", "AI strongly suggests misinformation."
@@ -105,6 +392,10 @@ def determine_final_verdict(fc_rating, g_flag, g_conf, domain=None):
     return "INCONCLUSIVE", "Insufficient agreement to decide."
 
 # --- API Functions ---
+def _rate_limited(message, retry_after):
+    """Result for a call that hit an upstream quota; the job is delayed and retried."""
+    return {"status": "rate_limited", "message": message, "retry_after": retry_after}
+
 def _normalize_rating(text):
     t = (text or '').strip().lower()
     # Map common ratings to simple buckets
@@ -119,21 +410,8 @@ def _normalize_rating(text):
         return 'mixed'
     return 'unknown'
 
-def _tokenize(s):
-    tokens = re.findall(r"[a-z0-9]+", (s or '').lower())
-    stop = {"the","a","an","is","are","to","of","and","or","in","on","for","with"}
-    tokens = [t for t in tokens if len(t) > 2 and t not in stop]
-    return set(tokens)
-
-def _similar_enough(a, b, threshold=0.65):
-    A = _tokenize(a); B = _tokenize(b)
-    if not A or not B:
-        return False
-    inter = len(A & B); union = len(A | B)
-    if inter < 2:
-        return False
-    ratio = inter / union if union else 0.0
-    return ratio >= threshold
+# MinHash/LSH bands of every saved text, for linking paraphrases to an existing verdict
+NEAR_DUPES = NearDuplicateIndex(tokenize)
 
 # --- URL helpers ---
 _URL_REGEX = re.compile(r"^(?:https?://)?(?:[\w-]+\.)+[a-z]{2,}(?::\d+)?(?:/[\S]*)?$", re.IGNORECASE)
@@ -144,7 +422,11 @@ def looks_like_url(s: str) -> bool:
         return False
     return bool(_URL_REGEX.match(s))
 
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'igshid', 'mc_cid', 'mc_eid', 'ref_src', 'ref_url', '_ga', 'cmpid', 'ocid'}
+
 def normalize_url(u: str) -> str:
+    """The URL as the user gave it, with https:// added if it has no scheme. This is the URL that gets fetched."""
     u = (u or '').strip()
     if not u:
         return u
@@ -153,187 +435,332 @@ def normalize_url(u: str) -> str:
         u = 'https://' + u
     return u
 
+def _is_tracking_param(pair):
+    key = unquote_plus(pair.partition('=')[0]).lower()
+    return key.startswith('utm_') or key in TRACKING_PARAMS
+
+def canonical_url(u: str) -> str:
+    """Dedupe and cache key for a URL; never fetched.
+
+    Scheme and host are lowercased (userinfo is kept as is), tracking parameters
+    and plain fragments are dropped. Everything else stays verbatim: the other
+    query pairs keep their order, encoding and blank values, and hash-route
+    fragments (#/..., #!...) are kept since they select the page.
+    """
+    u = normalize_url(u)
+    if not u:
+        return u
+    parsed = urlsplit(u)
+    userinfo, at, hostport = parsed.netloc.rpartition('@')
+    query = '&'.join(pair for pair in parsed.query.split('&') if pair and not _is_tracking_param(pair))
+    fragment = parsed.fragment if parsed.fragment[:1] in ('/', '!') else ''
+    return urlunsplit((parsed.scheme.lower(), userinfo + at + hostport.lower(), parsed.path or '/', query, fragment))
+
+def fact_check_cache_key(search_query, is_url_content=False):
+    """Cache key: the tokenize-normalized query plus the mode (URL titles use a stricter threshold)."""
+    return ('url:' if is_url_content else 'text:') + ' '.join(sorted(tokenize(search_query)))
+
 def call_fact_check_api(query_text, is_url_content=False):
-    """Calls Google Fact Check API and aggregates ratings across top similar claims."""
-    API_KEY = config.GOOGLE_API_KEY; url = "https://factchecktools.googleapis.com/v1alpha1/claims:search"
-    
+    """Calls Google Fact Check API (through the response cache) and aggregates ratings across top similar claims."""
     # For URL content, extract key claims/title for better API matching
     search_query = query_text
     if is_url_content and '|' in query_text:
         # Use just the title (first part before |) for fact check API
         search_query = query_text.split('|')[0].strip()
         print(f"[FCAPI] Using title for search: {search_query[:80]}...")
-    
+
+    cache_key = fact_check_cache_key(search_query, is_url_content)
+    cached = FACT_CHECK_CACHE.get(cache_key)
+    if cached is not None:
+        print(f"[FCAPI] Cache hit: {cache_key[:60]}")
+        return dict(cached, cached=True)
+    result = _local_fact_check(search_query, is_url_content) or _query_fact_check_api(search_query, is_url_content)
+    FACT_CHECK_CACHE.put(cache_key, result)
+    return result
+
+def _claim_threshold(is_url_content):
+    return 0.75 if is_url_content else 0.65 # URL titles must match more closely
+
+def _aggregate_reviews(selected_reviews):
+    """Fuses (rating, publisher) pairs from matching claims into one Fact Check result."""
+    if not selected_reviews:
+        return {"status": "success", "found": False, "publisher": "N/A", "rating": "Not Found"}
+    # Tally normalized buckets
+    true_c = 0; false_c = 0; mixed_c = 0; first_pub = 'N/A'; first_rating = None
+    for r, p in selected_reviews:
+        cat = _normalize_rating(r)
+        if first_rating is None:
+            first_rating = r; first_pub = p
+        if cat == 'true': true_c += 1
+        elif cat == 'false': false_c += 1
+        elif cat == 'mixed': mixed_c += 1
+    if false_c > true_c and false_c >= 1:
+        return {"status": "success", "found": True, "publisher": first_pub, "rating": first_rating if _normalize_rating(first_rating)=='false' else 'False'}
+    if true_c > false_c and true_c >= 1:
+        return {"status": "success", "found": True, "publisher": first_pub, "rating": first_rating if _normalize_rating(first_rating)=='true' else 'True'}
+    # Otherwise, inconclusive
+    return {"status": "success", "found": False, "publisher": first_pub, "rating": "Not Found"}
+
+def _local_fact_check(search_query, is_url_content=False):
+    """Answers from the local claim index when its matches give a decisive rating.
+
+    Returns:
+        The Fact Check result (with source 'local'), or None to fall back to the API.
+    """
+    if CLAIM_INDEX is None:
+        return None
+    try:
+        matches = CLAIM_INDEX.search(search_query, _claim_threshold(is_url_content))
+    except sqlite3.Error as e:
+        print(f"[FCAPI] Local claim index lookup failed: {e}")
+        return None
+    result = _aggregate_reviews([review for match in matches for review in match['reviews']])
+    if not result['found']: # Nothing decisive locally; newer reviews may exist upstream
+        return None
+    CLAIM_INDEX.record_hit()
+    print(f"[FCAPI] Answered from {len(matches)} locally indexed claim(s): {result['rating']}")
+    return dict(result, source='local')
+
+def _query_fact_check_api(search_query, is_url_content=False):
+    """Performs the actual Fact Check API request for an already-derived search query."""
+    API_KEY = config.GOOGLE_API_KEY; url = "https://factchecktools.googleapis.com/v1alpha1/claims:search"
     params = {'query': search_query, 'key': API_KEY, 'languageCode': 'en-US', 'pageSize': 10}
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = UPSTREAM.get(url, params=params, timeout=10)
         if response.status_code == 200:
             data = response.json(); claims = data.get('claims') or []
+            if CLAIM_INDEX is not None and claims:
+                try:
+                    CLAIM_INDEX.harvest(claims)
+                except sqlite3.Error as e:
+                    print(f"[FCAPI] Could not index claims: {e}")
             if not claims:
                 return {"status": "success", "found": False, "publisher": "N/A", "rating": "Not Found"}
-            # Filter to claims similar to our query/title to reduce mismatches
+            # Filter to claims similar to our query/title to reduce mismatches (the query is tokenized once)
             selected_reviews = []
-            for c in claims:
-                claim_text = c.get('text') or ''
-                # For similarity check, use the search_query (which is the title for URL content)
-                sim_ok = _similar_enough(search_query, claim_text, threshold=0.75) if is_url_content else _similar_enough(search_query, claim_text, threshold=0.65)
-                if not sim_ok:
-                    continue
+            ranked = QueryMatcher(search_query).rank([c.get('text') or '' for c in claims], _claim_threshold(is_url_content))
+            for index, _ in sorted(ranked): # API order: the first review found is the one reported
+                c = claims[index]
                 for cr in (c.get('claimReview') or []):
                     r = (cr.get('textualRating') or '').strip()
                     p = cr.get('publisher', {}).get('name', 'N/A')
                     if r:
                         selected_reviews.append((r, p))
-            if not selected_reviews:
-                return {"status": "success", "found": False, "publisher": "N/A", "rating": "Not Found"}
-            # Tally normalized buckets
-            true_c = 0; false_c = 0; mixed_c = 0; first_pub = 'N/A'; first_rating = None
-            for r, p in selected_reviews:
-                cat = _normalize_rating(r)
-                if first_rating is None:
-                    first_rating = r; first_pub = p
-                if cat == 'true': true_c += 1
-                elif cat == 'false': false_c += 1
-                elif cat == 'mixed': mixed_c += 1
-            if false_c > true_c and false_c >= 1:
-                return {"status": "success", "found": True, "publisher": first_pub, "rating": first_rating if _normalize_rating(first_rating)=='false' else 'False'}
-            if true_c > false_c and true_c >= 1:
-                return {"status": "success", "found": True, "publisher": first_pub, "rating": first_rating if _normalize_rating(first_rating)=='true' else 'True'}
-            # Otherwise, inconclusive
-            return {"status": "success", "found": False, "publisher": first_pub, "rating": "Not Found"}
+            return _aggregate_reviews(selected_reviews)
         elif response.status_code == 429:
             print(f"[FCAPI Err 429]: Rate limit hit. {response.text}")
-            return {"status": "error", "message": "Fact Check API quota exceeded."}
+            retry_after = parse_retry_after(response.headers.get('Retry-After')) or UPSTREAM.retry_after('factchecktools.googleapis.com')
+            return _rate_limited("Fact Check API quota exceeded.", retry_after)
         else:
             print(f"[FCAPI Err {response.status_code}]: {response.text}")
             return {"status": "error", "message": "Fact Check API failed."}
+    except RateLimited as e:
+        return _rate_limited("Fact Check API quota exceeded.", e.retry_after)
     except requests.exceptions.Timeout:
         return {"status": "error", "message": "Fact Check API timed out."}
     except Exception as e:
         print(f"[FCAPI Exc] {e}")
         return {"status": "error", "message": "Fact Check API connection failed."}
 
-def extract_article_content(article_url):
-    """Extracts article content (title + description/body) from a news URL.
-    Returns a comprehensive text for better fact-checking.
-    """
+def _news_api_article(articles):
+    """Builds the extraction result from the first article of a GNews/NewsAPI response."""
+    art = articles[0]
+    title = art.get('title', '')
+    desc = art.get('description', '')
+    content = art.get('content', '')
+    combined = ' | '.join([x for x in [title, desc, content] if x])
+    return {"status": "success", "content": combined, "title": title}
+
+def _extract_direct(article_url, stop_event=None, cached=None):
+    """Source 1: fetch the publisher page itself (conditionally, if a cached copy has validators)."""
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
     try:
-        r = requests.get(article_url, timeout=10, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
+        # Stream the page through an incremental parser; stop once title, description
+        # and the opening paragraphs are in, or at the byte/time cap
+        r = UPSTREAM.get(article_url, timeout=10, stream=True, headers=headers)
+        if r.status_code == 304 and cached:
+            r.close()
+            print(f"[Article Extract] Not modified: {article_url}")
+            return {"status": "success", "content": cached['content'], "title": cached['title'], "revalidated": True}
         if r.status_code == 200:
-            html = r.text or ''
-            
-            # Extract title
-            title = None
-            # Try OpenGraph title first
-            m = re.search(r'<meta[^>]+property=["\']og:title["\'][^>]+content=["\']([^"\']+)["\']', html, re.IGNORECASE)
-            if m:
-                title = m.group(1).strip()
-            else:
-                # Fallback: <title> tag
-                m2 = re.search(r'<title[^>]*>(.*?)</title>', html, re.IGNORECASE | re.DOTALL)
-                if m2:
-                    title = m2.group(1).strip()
-            
-            # Extract description/summary
-            description = None
-            # Try OpenGraph description
-            m_desc = re.search(r'<meta[^>]+property=["\']og:description["\'][^>]+content=["\']([^"\']+)["\']', html, re.IGNORECASE)
-            if m_desc:
-                description = m_desc.group(1).strip()
-            else:
-                # Try meta description
-                m_desc2 = re.search(r'<meta[^>]+name=["\']description["\'][^>]+content=["\']([^"\']+)["\']', html, re.IGNORECASE)
-                if m_desc2:
-                    description = m_desc2.group(1).strip()
-            
-            # Extract article body (common patterns)
-            article_body = None
-            # Try <article> tag
-            article_match = re.search(r'<article[^>]*>(.*?)</article>', html, re.IGNORECASE | re.DOTALL)
-            if article_match:
-                article_html = article_match.group(1)
-                # Remove script and style tags
-                article_html = re.sub(r'<script[^>]*>.*?</script>', '', article_html, flags=re.IGNORECASE | re.DOTALL)
-                article_html = re.sub(r'<style[^>]*>.*?</style>', '', article_html, flags=re.IGNORECASE | re.DOTALL)
-                # Extract text from paragraphs
-                paragraphs = re.findall(r'<p[^>]*>(.*?)</p>', article_html, re.IGNORECASE | re.DOTALL)
-                if paragraphs:
-                    # Clean HTML tags and get first few paragraphs
-                    clean_paras = []
-                    for p in paragraphs[:5]:  # Limit to first 5 paragraphs
-                        clean_p = re.sub(r'<[^>]+>', '', p).strip()
-                        if len(clean_p) > 30:  # Only include substantial paragraphs
-                            clean_paras.append(clean_p)
-                    if clean_paras:
-                        article_body = ' '.join(clean_paras)
-            
-            # Combine title, description, and body
-            combined_text = []
-            if title:
-                combined_text.append(title)
-            if description and description not in (title or ''):
-                combined_text.append(description)
-            if article_body:
-                # Limit body to reasonable length (around 1000 chars)
-                if len(article_body) > 1000:
-                    article_body = article_body[:1000] + '...'
-                combined_text.append(article_body)
-            
-            if combined_text:
-                full_text = ' | '.join(combined_text)
-                return {"status": "success", "content": full_text, "title": title}
+            validators = {"etag": r.headers.get('ETag'), "last_modified": r.headers.get('Last-Modified')}
+            extracted = extract_from_response(r, max_bytes=EXTRACT_MAX_BYTES, max_seconds=EXTRACT_MAX_SECONDS, stop_event=stop_event)
+            print(f"[Article Extract] Read {extracted['bytes_read']} bytes from {article_url}"
+                  f"{' (stopped early)' if extracted.get('stopped_early') else ''}{' (capped)' if extracted.get('truncated') else ''}")
+            if extracted['status'] == 'success':
+                return dict(validators, status="success", content=extracted['content'], title=extracted['title'])
+        else:
+            r.close()
     except Exception as e:
         print(f"[Article Extract] Direct fetch failed: {e}")
-    
-    # Fallback: Try GNews API
+    return {"status": "not_found", "message": "Could not extract content from the URL."}
+
+def _extract_gnews(article_url):
+    """Source 2: GNews search for the URL."""
     try:
         GNEWS_KEY = getattr(config, 'GNEWS_API_KEY', None)
         if GNEWS_KEY:
             url = "https://gnews.io/api/v4/search"
             params = {'q': article_url, 'lang': 'en', 'max': 1, 'token': GNEWS_KEY}
-            gr = requests.get(url, params=params, timeout=8)
+            gr = UPSTREAM.get(url, params=params, timeout=8)
             if gr.status_code == 200:
                 gd = gr.json(); arts = gd.get('articles') or []
                 if arts:
-                    art = arts[0]
-                    title = art.get('title', '')
-                    desc = art.get('description', '')
-                    content = art.get('content', '')
-                    combined = ' | '.join([x for x in [title, desc, content] if x])
-                    return {"status": "success", "content": combined, "title": title}
+                    return _news_api_article(arts)
+            elif gr.status_code == 429:
+                print(f"[GNews Err 429]: Rate limit hit. {gr.text}")
+                retry_after = parse_retry_after(gr.headers.get('Retry-After')) or UPSTREAM.retry_after('gnews.io')
+                return _rate_limited("GNews rate limit exceeded.", retry_after)
+    except RateLimited as e:
+        return _rate_limited("GNews rate limit exceeded.", e.retry_after)
     except Exception as e:
         print(f"[GNews Fallback] Failed: {e}")
-    
-    # Fallback: Try NewsAPI
+    return {"status": "not_found", "message": "Could not extract content from the URL."}
+
+def _extract_newsapi(article_url):
+    """Source 3: NewsAPI search for the URL."""
     try:
         API_KEY = getattr(config, 'NEWS_API_KEY', None)
         if API_KEY:
             url = "https://newsapi.org/v2/everything"
             params = {'q': article_url, 'apiKey': API_KEY, 'searchIn': 'title,description,content', 'pageSize': 1}
-            response = requests.get(url, params=params, timeout=8)
+            response = UPSTREAM.get(url, params=params, timeout=8)
             if response.status_code == 200:
                 data = response.json(); articles = data.get('articles')
                 if articles:
-                    art = articles[0]
-                    title = art.get('title', '')
-                    desc = art.get('description', '')
-                    content = art.get('content', '')
-                    combined = ' | '.join([x for x in [title, desc, content] if x])
-                    return {"status": "success", "content": combined, "title": title}
+                    return _news_api_article(articles)
             elif response.status_code == 429:
                 print(f"[NewsAPI Err 429]: Rate limit hit. {response.text}")
-                return {"status": "error", "message": "News API rate limit exceeded."}
+                retry_after = parse_retry_after(response.headers.get('Retry-After')) or UPSTREAM.retry_after('newsapi.org')
+                return _rate_limited("News API rate limit exceeded.", retry_after)
+    except RateLimited as e:
+        return _rate_limited("News API rate limit exceeded.", e.retry_after)
     except requests.exceptions.Timeout:
         return {"status": "error", "message": "News API timed out."}
     except Exception as e:
         print(f"[NewsAPI Fallback] Failed: {e}")
-    
     return {"status": "not_found", "message": "Could not extract content from the URL."}
 
-def check_credibility_with_gemini(text_to_analyze):
-    """Uses Gemini to analyze text and provide a structured JSON response."""
+EXTRACT_FALLBACKS = (('gnews', _extract_gnews), ('newsapi', _extract_newsapi))
+
+def _extraction_won(result, source, start):
+    elapsed_ms = round((time.monotonic() - start) * 1000)
+    print(f"[Article Extract] Won by {source} in {elapsed_ms} ms")
+    return dict(result, source=source, elapsed_ms=elapsed_ms)
+
+def _extraction_lost(results):
+    """Picks the most useful failure: rate limits (retryable) first, then errors."""
+    for status in ('rate_limited', 'error'):
+        for result in results:
+            if result.get('status') == status:
+                return result
+    return {"status": "not_found", "message": "Could not extract content from the URL."}
+
+def extract_article_content(article_url, hedged=None):
+    """Extracts article content (title + description/body) from a news URL.
+    Returns a comprehensive text for better fact-checking.
+
+    Results are kept in ARTICLE_CACHE by canonical URL: a fresh copy is returned
+    with no network call, a stale one is revalidated with a conditional GET.
+    The URL itself is fetched as given.
+    """
+    article_url = normalize_url(article_url)
+    cache_key = canonical_url(article_url)
+    cached = ARTICLE_CACHE.get(cache_key)
+    if cached and cached['fresh']:
+        print(f"[Article Extract] Cache hit: {cache_key}")
+        return {"status": "success", "content": cached['content'], "title": cached['title'], "source": "cache", "elapsed_ms": 0}
+    result = _extract_live(article_url, hedged, cached)
+    if result.get('status') == 'success':
+        if result.pop('revalidated', False):
+            ARTICLE_CACHE.touch(cache_key)
+        else:
+            ARTICLE_CACHE.put(cache_key, result['content'], result.get('title'), result.pop('etag', None), result.pop('last_modified', None))
+    return result
+
+def _extract_live(article_url, hedged=None, cached=None):
+    """Fetches an article from its sources.
+
+    In hedged mode (EXTRACT_HEDGED) the direct fetch starts alone; if it fails or
+    has not finished within EXTRACT_HEDGE_DELAY seconds, the news-API fallbacks
+    are launched in parallel and the first usable result wins. The result
+    records the winning source and elapsed_ms.
+    """
+    hedged = EXTRACT_HEDGED if hedged is None else hedged
+    start = time.monotonic(); results = []
+    direct = partial(_extract_direct, cached=cached)
+    if not hedged:
+        for source, extract in (('direct', direct),) + EXTRACT_FALLBACKS:
+            result = extract(article_url)
+            if result.get('status') == 'success':
+                return _extraction_won(result, source, start)
+            results.append(result)
+        return _extraction_lost(results)
+
+    stop_event = threading.Event() # Tells a still-streaming direct fetch to give up
+    futures = {EXTRACT_EXECUTOR.submit(direct, article_url, stop_event): 'direct'}
+    hedging = False
+    try:
+        while futures:
+            done, _ = wait(futures, timeout=None if hedging else EXTRACT_HEDGE_DELAY, return_when=FIRST_COMPLETED)
+            for future in done:
+                source = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"status": "error", "message": f"{source} extraction raised: {e}"}
+                if result.get('status') == 'success':
+                    return _extraction_won(result, source, start)
+                results.append(result)
+            if not hedging:
+                # Direct fetch failed or is slow: race the fallbacks against it
+                hedging = True
+                print(f"[Article Extract] Direct fetch {'failed' if done else 'slow'}; launching fallbacks in parallel.")
+                for source, extract in EXTRACT_FALLBACKS:
+                    futures[EXTRACT_EXECUTOR.submit(extract, article_url)] = source
+    finally:
+        stop_event.set()
+        for future in futures:
+            future.cancel() # Losers that already started just finish in the background
+    return _extraction_lost(results)
+
+def check_credibility_with_gemini(text_to_analyze, text_hash=None, force_refresh=False):
+    """Uses Gemini (through the verdict cache) to analyze text and provide a structured JSON response.
+
+    A cached verdict for the same text, model and prompt version is returned unless it
+    is older than GEMINI_CACHE_MAX_AGE or force_refresh is set.
+    """
+    text_hash = text_hash or hashlib.sha256(text_to_analyze.encode('utf-8')).hexdigest()
+    cache_key = GeminiCache.make_key(text_hash, GEMINI_MODEL, GEMINI_PROMPT_VERSION)
+    if not force_refresh:
+        cached = GEMINI_CACHE.get(cache_key)
+        if cached is not None:
+            print(f"[Gemini] Cache hit for {text_hash[:8]}... (age {time.time() - cached['cached_at']:.0f}s)")
+            return {"status": "success", "data": cached['data'], "cached": True, "cached_at": cached['cached_at']}
+    if GEMINI_BATCHER is not None:
+        result = GEMINI_BATCHER.submit(text_to_analyze).result()
+    else:
+        result = _query_gemini(text_to_analyze)
+    if result.get('status') == 'success':
+        GEMINI_CACHE.put(cache_key, result['data'])
+    return result
+
+def _gemini_error(e):
+    """Maps a Gemini call exception to a result dict (rate limits are reported separately)."""
+    if isinstance(e, RateLimited):
+        return _rate_limited("Gemini quota exceeded.", e.retry_after)
+    if getattr(e, 'code', None) == 429: # google.genai APIError for RESOURCE_EXHAUSTED
+        UPSTREAM.throttled(GEMINI_HOST)
+        return _rate_limited("Gemini quota exceeded.", UPSTREAM.retry_after(GEMINI_HOST))
+    return {"status": "error", "message": f"Gemini analysis failed: {e}"}
+
+def _query_gemini(text_to_analyze):
+    """Performs the actual Gemini generate_content call."""
     if GEMINI_CLIENT is None or types is None:
         return {"status": "error", "message": "Gemini client not initialized."}
     output_schema = types.Schema(
@@ -342,104 +769,652 @@ def check_credibility_with_gemini(text_to_analyze):
         required=["misinformation_flag", "simulated_confidence_score", "reasoning_snippet"])
     prompt = (f"Analyze the following content for factual errors... Respond ONLY with the requested JSON object. Content to analyze: \"{text_to_analyze}\"")
     try:
-        response = GEMINI_CLIENT.models.generate_content(
-            model='gemini-2.5-flash', contents=prompt,
-            config=types.GenerateContentConfig(response_mime_type="application/json", response_schema=output_schema, temperature=0.0)
-        )
+        with UPSTREAM.track(GEMINI_HOST):
+            response = GEMINI_CLIENT.models.generate_content(
+                model=GEMINI_MODEL, contents=prompt,
+                config=types.GenerateContentConfig(response_mime_type="application/json", response_schema=output_schema, temperature=0.0)
+            )
         gemini_result = json.loads(response.text)
         return {"status": "success", "data": gemini_result}
-    except Exception as e: return {"status": "error", "message": f"Gemini analysis failed: {e}"}
+    except Exception as e:
+        return _gemini_error(e)
 
-# --- Background Worker Thread ---
-def analysis_worker():
-    """Processes jobs from queue, calls APIs, uses MerkleTree, saves."""
-    print("Worker thread started. Waiting for jobs...")
-    while True:
-        if job_queue:
-            job = job_queue.popleft(); text_to_analyze = job['text']; text_hash = job['hash']
-            original_url = job.get('original_url'); domain = None
-            if original_url:
-                try:
-                    parsed_uri = urlparse(original_url); domain = parsed_uri.netloc
-                    if domain.startswith('www.'): domain = domain[4:]
-                except Exception: pass
-
-            print(f"\n--- [Worker] ---"); print(f"Got job (Hash: {text_hash[:8]}...): '{text_to_analyze[:100]}...'")
-            
-            # Determine if this is URL content (contains the | separator)
-            is_url_content = '|' in text_to_analyze and original_url is not None
-
-            # 1. Fact Check API Call
-            api_result_fc = call_fact_check_api(text_to_analyze, is_url_content=is_url_content)
-            fc_rating = api_result_fc.get('rating', 'API Error')
-            if api_result_fc.get('status') != 'success': api_result_fc = {"found": False, "publisher": "N/A", "rating": "API Error"}
-
-            # 2. Gemini API Call
-            api_result_gemini = check_credibility_with_gemini(text_to_analyze)
-            gemini_data = api_result_gemini.get('data', {})
-            g_flag = gemini_data.get('misinformation_flag'); g_conf = gemini_data.get('simulated_confidence_score'); g_reason = gemini_data.get('reasoning_snippet')
-            print(f"Gemini Result: Flag={g_flag}, Conf={g_conf}")
-            
-# 3. DETERMINE FINAL VERDICT
-            final_verdict, final_reasoning = determine_final_verdict(fc_rating, g_flag, g_conf, domain)
-            print(f"FINAL VERDICT: {final_verdict}")
-            
-            # 4. Save to DB (FIXED INDENTATION AND ERROR HANDLING)
-            conn = None
+GEMINI_BATCH_ITEM_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {"index": {"type": "INTEGER"}, "misinformation_flag": {"type": "BOOLEAN"},
+                   "simulated_confidence_score": {"type": "INTEGER"}, "reasoning_snippet": {"type": "STRING"}},
+    "required": ["index", "misinformation_flag", "simulated_confidence_score", "reasoning_snippet"],
+}
+
+def query_gemini_batch(texts, client=None):
+    """Scores several texts in one generate_content call using an array response schema.
+
+    Args:
+        texts: The contents to analyze.
+        client: A genai.Client (or any stub exposing models.generate_content); defaults to GEMINI_CLIENT.
+
+    Returns:
+        One result dict per text, in order. Quota errors apply to every item.
+
+    Raises:
+        ValueError if the response is not a well-formed array covering every item,
+        so the caller can fall back to single calls.
+    """
+    client = client or GEMINI_CLIENT
+    if client is None:
+        raise ValueError("Gemini client not initialized.")
+    items = "\n".join(f"[{i}] \"{t}\"" for i, t in enumerate(texts))
+    prompt = (f"Analyze each of the following {len(texts)} numbered contents for factual errors... "
+              f"Respond ONLY with a JSON array containing exactly one object per content, with its index. Contents to analyze:\n{items}")
+    try:
+        with UPSTREAM.track(GEMINI_HOST): # One quota token for the whole batch
+            response = client.models.generate_content(
+                model=GEMINI_MODEL, contents=prompt,
+                config={"response_mime_type": "application/json", "temperature": 0.0,
+                        "response_schema": {"type": "ARRAY", "items": GEMINI_BATCH_ITEM_SCHEMA}})
+    except Exception as e:
+        result = _gemini_error(e)
+        if result['status'] == 'rate_limited':
+            return [result] * len(texts)
+        raise ValueError(result['message'])
+    parsed = json.loads(response.text) # JSONDecodeError is a ValueError
+    if not isinstance(parsed, list):
+        raise ValueError("batch response is not an array")
+    by_index = {}
+    for entry in parsed:
+        if not isinstance(entry, dict) or not all(k in entry for k in GEMINI_BATCH_ITEM_SCHEMA['required']):
+            raise ValueError(f"malformed batch entry: {entry!r:.80}")
+        by_index[entry['index']] = entry
+    if sorted(by_index) != list(range(len(texts))):
+        raise ValueError(f"batch indexes {sorted(by_index)} do not match {len(texts)} items")
+    return [{"status": "success", "data": {k: by_index[i][k] for k in GEMINI_BATCH_ITEM_SCHEMA['required'] if k != 'index'}}
+            for i in range(len(texts))]
+
+# --- Per-Job Upstream Fan-out ---
+def run_upstream_calls(text_to_analyze, is_url_content=False, deadline=None, reuse=None, text_hash=None, force_refresh=False):
+    """Starts the Fact Check and Gemini calls at the same time and joins them.
+
+    Whatever has not returned by the deadline is treated as missing, so the
+    verdict is computed from the signals that did arrive. Results passed in
+    reuse (from an earlier, rate-limited attempt) are not fetched again.
+
+    Returns:
+        (fact_check_result, gemini_result, missing_signals) where missing_signals
+        lists 'fact_check' and/or 'gemini' for calls that missed the deadline.
+    """
+    deadline = JOB_DEADLINE if deadline is None else deadline
+    results = dict(reuse or {}); missing_signals = []
+    calls = {
+        'fact_check': lambda: UPSTREAM_PROVIDERS['fact_check'](text_to_analyze, is_url_content=is_url_content),
+        'gemini': lambda: UPSTREAM_PROVIDERS['gemini'](text_to_analyze, text_hash, force_refresh),
+    }
+    futures = {signal: UPSTREAM_EXECUTOR.submit(call) for signal, call in calls.items() if signal not in results}
+    done, _ = wait(futures.values(), timeout=deadline)
+    for signal, future in futures.items():
+        if future in done:
             try:
-                conn = sqlite3.connect(DB_FILE); cursor = conn.cursor()
-                timestamp = datetime.datetime.now().isoformat()
-                
-                # Merkle Tree data
-                data_to_verify = [timestamp, text_to_analyze, fc_rating, api_result_fc['publisher'], str(g_conf)]
-                tree = MerkleTree(data_to_verify); merkle_hash = tree.root_hash
-
-                cursor.execute('''INSERT INTO analysis_results
-                    (timestamp, query_text, text_hash, api_result_found, rating, publisher, merkle_root_hash, original_url, domain,
-                     gemini_flag, gemini_confidence, gemini_reasoning, final_verdict)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                    (timestamp, text_to_analyze, text_hash, api_result_fc['found'], fc_rating,
-                     api_result_fc['publisher'], merkle_hash, original_url, domain,
-                     g_flag, g_conf, g_reason, final_verdict))
-                conn.commit()
-                print(f"[DB] Saved. Final Verdict: {final_verdict}. Hash: {merkle_hash[:8]}...")
-            except sqlite3.IntegrityError: 
-                print(f"[DB] Existing hash {text_hash[:8]}..., updating row instead.")
-                try:
-                    if conn is None:
-                        conn = sqlite3.connect(DB_FILE)
-                    cursor = conn.cursor()
-                    timestamp = datetime.datetime.now().isoformat()
-                    cursor.execute('''UPDATE analysis_results SET
-                        timestamp=?, api_result_found=?, rating=?, publisher=?, merkle_root_hash=?,
-                        original_url=?, domain=?, gemini_flag=?, gemini_confidence=?, gemini_reasoning=?, final_verdict=?
-                        WHERE text_hash=?''',
-                        (timestamp, api_result_fc['found'], fc_rating, api_result_fc['publisher'], merkle_hash,
-                         original_url, domain, g_flag, g_conf, g_reason, final_verdict, text_hash))
-                    conn.commit()
-                    print(f"[DB] Updated existing record. Final Verdict: {final_verdict}.")
-                except Exception as e2:
-                    if conn: conn.rollback()
-                    print(f"[DB Error] Update failed: {e2}")
-            except Exception as e: 
-                print(f"[DB Error] Save failed: {e}")
-            finally:
-                if conn: conn.close()
-
-            print(f"Finished: '{text_to_analyze}'"); print(f"--- [Worker] ---\n")
+                results[signal] = future.result()
+            except Exception as e:
+                results[signal] = {"status": "error", "message": f"{signal} call raised: {e}"}
+        else:
+            future.cancel() # No-op if already running; its result is simply discarded
+            missing_signals.append(signal)
+    fc_result = results.get('fact_check') or {"status": "timeout", "rating": "Timed Out", "message": "Fact Check API missed the job deadline."}
+    gemini_result = results.get('gemini') or {"status": "timeout", "message": "Gemini missed the job deadline."}
+    return fc_result, gemini_result, missing_signals
+
+# --- Pluggable Upstream Providers ---
+# The pipeline looks its upstream calls up here, so offline tools can swap in
+# recorded or stub responses. Signatures match the live functions.
+UPSTREAM_PROVIDERS = {
+    'extract': extract_article_content, # (url) -> extraction result
+    'fact_check': call_fact_check_api, # (text, is_url_content=False) -> Fact Check result
+    'gemini': check_credibility_with_gemini, # (text, text_hash=None, force_refresh=False) -> Gemini result
+}
+
+def set_upstream_providers(**providers):
+    """Replaces some of the upstream providers (extract, fact_check, gemini)."""
+    unknown = set(providers) - set(UPSTREAM_PROVIDERS)
+    if unknown:
+        raise ValueError(f"Unknown upstream providers: {', '.join(sorted(unknown))}")
+    UPSTREAM_PROVIDERS.update(providers)
+
+# --- Background Worker Pool ---
+def process_job(job):
+    """Runs one analysis job through analyze_text and reports the outcome to the job registry.
+
+    Returns:
+        The analyze_text outcome, so the stage worker can record it on the queue.
+    """
+    job_id = job.get('job_id')
+    job_registry.update(job_id, status='running')
+    outcome = analyze_text(job['text'], job['hash'], job.get('original_url'), reuse=job.get('partial'),
+                           force_refresh=job.get('force_refresh', False),
+                           retry_limited=job.get('attempts', 0) < RATE_LIMIT_MAX_REQUEUES)
+    if outcome['status'] == 'rate_limited':
+        job['partial'] = outcome['partial']
+        requeue_later(job_queue, job, outcome['retry_after'], outcome['reason'])
+    elif outcome['status'] == 'done':
+        job_registry.update(job_id, status='done', result=outcome['result'])
+    else:
+        job_registry.update(job_id, status='failed', error=outcome['error'])
+    return outcome
+
+def analyze_text(text_to_analyze, text_hash, original_url=None, reuse=None, force_refresh=False, retry_limited=True):
+    """Runs the pipeline for one text: calls APIs, fuses the verdict, uses MerkleTree, saves.
+
+    Args:
+        reuse: Signals kept from an earlier, rate-limited attempt.
+        retry_limited: If a signal is rate limited, stop and report it instead of
+                       saving a degraded verdict.
+
+    Returns:
+        {"status": "done", "result": saved row dict},
+        {"status": "rate_limited", "partial": ..., "retry_after": ..., "reason": ...}
+        or {"status": "failed", "error": ...}.
+    """
+    domain = None
+    if original_url:
+        try:
+            parsed_uri = urlparse(original_url); domain = parsed_uri.netloc
+            if domain.startswith('www.'): domain = domain[4:]
+        except Exception: pass
+
+    print(f"\n--- [{threading.current_thread().name}] ---"); print(f"Got job (Hash: {text_hash[:8]}...): '{text_to_analyze[:100]}...'")
+
+    # MinHash band keys, computed here rather than under the DB writer's lock; used for the lookup and saved with the row
+    band_keys = NEAR_DUPES.keys(text_to_analyze)
+
+    # Near-duplicate of an analyzed text: reuse its verdict instead of calling the APIs again.
+    # A text with its own saved row is re-analyzed as before (never linked to its paraphrases).
+    if NEAR_DUP_THRESHOLD and not force_refresh and reuse is None and not already_analyzed(text_hash):
+        match = find_near_duplicate(text_to_analyze, text_hash, band_keys)
+        if match is not None:
+            return link_near_duplicate(text_to_analyze, text_hash, original_url, domain, *match, band_keys=band_keys)
+    
+    # Determine if this is URL content (contains the | separator)
+    is_url_content = '|' in text_to_analyze and original_url is not None
+
+    # 1 + 2. Fact Check and Gemini API calls, run concurrently under one deadline
+    api_result_fc, api_result_gemini, missing_signals = run_upstream_calls(
+        text_to_analyze, is_url_content, reuse=reuse, text_hash=text_hash, force_refresh=force_refresh)
+
+    # Quota hit: delay and retry the job rather than saving a degraded verdict
+    signals = {'fact_check': api_result_fc, 'gemini': api_result_gemini}
+    limited = {sig: r for sig, r in signals.items() if r.get('status') == 'rate_limited'}
+    if limited and retry_limited:
+        return {"status": "rate_limited", "partial": {sig: r for sig, r in signals.items() if r.get('status') == 'success'},
+                "retry_after": max(r.get('retry_after') or 1.0 for r in limited.values()),
+                "reason": f"{', '.join(limited)} rate limited"}
+    fc_rating = api_result_fc.get('rating', 'API Error')
+    if api_result_fc.get('status') != 'success': api_result_fc = {"found": False, "publisher": "N/A", "rating": fc_rating}
+
+    gemini_data = api_result_gemini.get('data', {})
+    g_flag = gemini_data.get('misinformation_flag'); g_conf = gemini_data.get('simulated_confidence_score'); g_reason = gemini_data.get('reasoning_snippet')
+    print(f"Gemini Result: Flag={g_flag}, Conf={g_conf}")
+    missing = ','.join(missing_signals) or None
+    if missing: print(f"[Deadline] Verdict computed without: {missing}")
+    
+# 3. DETERMINE FINAL VERDICT
+    final_verdict, final_reasoning = determine_final_verdict(fc_rating, g_flag, g_conf, domain)
+    print(f"FINAL VERDICT: {final_verdict}")
+    
+    # 4. Save to DB (through the group-commit writer when it is running)
+    timestamp = datetime.datetime.now().isoformat()
+    # Merkle Tree data
+    data_to_verify = [timestamp, text_to_analyze, fc_rating, api_result_fc['publisher'], str(g_conf)]
+    tree = MerkleTree(data_to_verify); merkle_hash = tree.root_hash
+    row = {
+        'timestamp': timestamp, 'query_text': text_to_analyze, 'text_hash': text_hash,
+        'api_result_found': api_result_fc['found'], 'rating': fc_rating, 'publisher': api_result_fc['publisher'],
+        'merkle_root_hash': merkle_hash, 'original_url': original_url, 'domain': domain,
+        'gemini_flag': g_flag, 'gemini_confidence': g_conf, 'gemini_reasoning': g_reason,
+        'final_verdict': final_verdict, 'missing_signals': missing, 'duplicate_of': None, '_band_keys': band_keys}
+    outcome = _save_analysis(row)
+    print(f"Finished: '{text_to_analyze}'"); print(f"--- [{threading.current_thread().name}] ---\n")
+    return outcome
+
+def _save_analysis(row):
+    """Saves a finished analysis row and returns the analyze_text outcome for it."""
+    try:
+        saved_id = save_result(row)
+        print(f"[DB] Saved. Final Verdict: {row['final_verdict']}. Hash: {row['merkle_root_hash'][:8]}...")
+    except Exception as e:
+        print(f"[DB Error] Save failed: {e}")
+        return {"status": "failed", "error": "Result could not be saved."}
+    seen_index.add(row['text_hash'])
+    return {"status": "done", "result": dict({k: v for k, v in row.items() if not k.startswith('_')}, id=saved_id)}
+
+def find_near_duplicate(text_to_analyze, text_hash, band_keys=None):
+    """Returns (row, similarity) for the most similar other saved text at or above NEAR_DUP_THRESHOLD, or None."""
+    try:
+        conn = DB.connect()
+        match = NEAR_DUPES.find(conn, text_to_analyze, NEAR_DUP_THRESHOLD, exclude_hash=text_hash, keys=band_keys)
+        if match is not None and match[0]['duplicate_of']:
+            root = conn.execute("SELECT text_hash FROM analysis_results WHERE id = ?", (match[0]['duplicate_of'],)).fetchone()
+            if root is None or root['text_hash'] == text_hash: # Root gone, or it is this very text: never self-link
+                return None
+        return match
+    except sqlite3.Error as e:
+        print(f"[NearDup] Lookup failed: {e}")
+        return None
+
+def link_near_duplicate(text_to_analyze, text_hash, original_url, domain, match, similarity, band_keys=None):
+    """Saves a text as a near-duplicate of an analyzed one, reusing its signals without any upstream call.
+
+    The verdict is recomputed from the reused signals, since it also depends on the domain.
+    """
+    root_id = match['duplicate_of'] or match['id'] # Always link to the originally analyzed row
+    g_flag = None if match['gemini_flag'] is None else bool(match['gemini_flag'])
+    final_verdict, _ = determine_final_verdict(match['rating'], g_flag, match['gemini_confidence'], domain)
+    print(f"[NearDup] {similarity:.0%} similar to #{root_id}; reusing its signals. FINAL VERDICT: {final_verdict}")
+    timestamp = datetime.datetime.now().isoformat()
+    data_to_verify = [timestamp, text_to_analyze, match['rating'], match['publisher'], str(match['gemini_confidence'])]
+    row = {
+        'timestamp': timestamp, 'query_text': text_to_analyze, 'text_hash': text_hash,
+        'api_result_found': match['api_result_found'], 'rating': match['rating'], 'publisher': match['publisher'],
+        'merkle_root_hash': MerkleTree(data_to_verify).root_hash, 'original_url': original_url, 'domain': domain,
+        'gemini_flag': g_flag, 'gemini_confidence': match['gemini_confidence'], 'gemini_reasoning': match['gemini_reasoning'],
+        'final_verdict': final_verdict, 'missing_signals': match['missing_signals'], 'duplicate_of': root_id,
+        '_band_keys': band_keys}
+    outcome = _save_analysis(row)
+    if outcome['status'] == 'done':
+        outcome['result']['similarity'] = round(similarity, 3)
+    return outcome
+
+RESULT_COLUMNS = ('timestamp', 'query_text', 'text_hash', 'api_result_found', 'rating', 'publisher', 'merkle_root_hash',
+                  'original_url', 'domain', 'gemini_flag', 'gemini_confidence', 'gemini_reasoning', 'final_verdict', 'missing_signals',
+                  'duplicate_of')
+# Re-analyzing a known text refreshes its row in place (same id, so history links stay valid)
+UPSERT_RESULT_SQL = (f"INSERT INTO analysis_results ({', '.join(RESULT_COLUMNS)}) VALUES ({', '.join('?' * len(RESULT_COLUMNS))}) "
+                     f"ON CONFLICT(text_hash) DO UPDATE SET "
+                     + ', '.join(f"{c} = excluded.{c}" for c in RESULT_COLUMNS if c not in ('query_text', 'text_hash')))
+
+def upsert_result(conn, row):
+    """Inserts or refreshes one analysis row inside the caller's transaction. Returns its id.
+
+    The row's near-duplicate band keys come precomputed in row['_band_keys'] (by
+    analyze_text), so the writer's transaction only runs INSERTs.
+    """
+    conn.execute(UPSERT_RESULT_SQL, [row[c] for c in RESULT_COLUMNS])
+    result_id = conn.execute("SELECT id FROM analysis_results WHERE text_hash = ?", (row['text_hash'],)).fetchone()[0]
+    keys = row.get('_band_keys')
+    if keys is None: # Rows built elsewhere: compute here (slow; holds the write lock)
+        keys = NEAR_DUPES.keys(row['query_text'])
+    NEAR_DUPES.index(conn, result_id, keys) # No-op for a refreshed row: same text, same keys
+    return result_id
+
+def save_result(row):
+    """Saves a result row and returns its id once committed.
+
+    With RESULT_WRITER running this waits for the next group commit (at most
+    DB_WRITE_MAX_LATENCY plus the commit); otherwise it commits on its own.
+    """
+    writer = RESULT_WRITER
+    if writer is not None:
+        try:
+            return writer.submit(row).result(timeout=DB_WRITE_TIMEOUT)
+        except RuntimeError: # Writer closed by shutdown; write directly
+            pass
+    with DB.transaction() as conn:
+        return upsert_result(conn, row)
+
+def start_result_writer():
+    """Starts the single DB writer thread that group-commits saved results."""
+    global RESULT_WRITER
+    if RESULT_WRITER is None:
+        RESULT_WRITER = GroupCommitWriter(DB, upsert_result, max_batch=DB_WRITE_BATCH, max_latency=DB_WRITE_MAX_LATENCY, name='DBWriter')
+    return RESULT_WRITER
+
+def stop_result_writer(timeout=None):
+    """Commits any pending results and stops the writer thread."""
+    global RESULT_WRITER
+    writer, RESULT_WRITER = RESULT_WRITER, None
+    if writer is not None:
+        writer.close(timeout)
+
+def process_fetch_job(job):
+    """Fetch stage: extracts article text for a URL job, then queues it for analysis.
+
+    Returns:
+        {"status": "queued"} once handed to the analysis stage, {"status": "rate_limited"}
+        if put back for a delayed retry, or {"status": "failed", "error": ...}.
+    """
+    job_id = job.get('job_id'); original_url = job['original_url']
+    job_registry.update(job_id, status='fetching')
+    print(f"[Fetch] Extracting {original_url}")
+    content_result = UPSTREAM_PROVIDERS['extract'](original_url)
+    if content_result.get('source'):
+        job_registry.update(job_id, extract_source=content_result['source'], extract_ms=content_result['elapsed_ms'])
+    if content_result.get('status') == 'rate_limited' and job.get('attempts', 0) < RATE_LIMIT_MAX_REQUEUES:
+        requeue_later(fetch_queue, job, content_result.get('retry_after') or 1.0, content_result.get('message'))
+        return {"status": "rate_limited"}
+    text_to_analyze = content_result.get('content') if content_result.get('status') == 'success' else None
+    if not text_to_analyze:
+        message = content_result.get('message', 'Failed to extract URL content')
+        print(f"[Fetch] Failed for {original_url}: {message}")
+        job_registry.update(job_id, status='failed', error=message)
+        return {"status": "failed", "error": message}
+    print(f"Extracted content ({len(text_to_analyze)} chars): {text_to_analyze[:100]}...")
+    enqueue_analysis(text_to_analyze, original_url, job_id, job.get('force_refresh', False))
+    return {"status": "queued"}
+
+def requeue_later(stage_queue, job, delay, reason):
+    """Puts a rate-limited job back on its stage queue after delay seconds."""
+    job['attempts'] = job.get('attempts', 0) + 1
+    delay = min(max(delay, 1.0), RATE_LIMIT_MAX_DELAY)
+    print(f"[RateLimit] {reason}; retrying job in {delay:.1f}s (attempt {job['attempts']}/{RATE_LIMIT_MAX_REQUEUES}).")
+    job_registry.update(job.get('job_id'), status='delayed', retry_in=round(delay, 1))
+    stage_queue.retry_later(job, delay, on_error=lambda: job_registry.update(
+        job.get('job_id'), status='failed', error="Server shut down before the delayed retry."))
+
+def _stage_worker(stage_queue, handler):
+    """Pulls jobs from one pipeline stage's blocking queue until it is closed and drained.
+
+    The handler returns its outcome dict; a "failed" one (e.g. nothing to extract)
+    is recorded on the queue without retries, since running it again would not help.
+    """
+    name = threading.current_thread().name
+    print(f"{name} started. Waiting for jobs...")
+    while True:
+        job = stage_queue.get() # Blocks until a job arrives or the queue is closed
+        if job is None:
+            break
+        try:
+            outcome = handler(job) or {}
+        except Exception as e:
+            print(f"[{name} Error] Job failed: {e}")
+            # A durable queue retries the job after a backoff, until it runs out of attempts
+            state = stage_queue.task_done(job, error=str(e))
+            job_registry.update(job.get('job_id'), status='delayed' if state == 'queued' else 'failed', error=str(e))
+            continue
+        if outcome.get('status') == 'failed':
+            stage_queue.task_done(job, error=outcome.get('error') or 'Job failed.', retry=False)
         else:
-            time.sleep(1)
+            stage_queue.task_done(job)
+    print(f"{name} stopped.")
+
+STORED_STATUS = {('fetch', 'queued'): 'fetch_queued', ('fetch', 'running'): 'fetching',
+                 ('analysis', 'queued'): 'queued', ('analysis', 'running'): 'running'}
+
+def stored_job_status(job_id):
+    """Rebuilds a job's status from the durable jobs table.
+
+    Covers jobs this process's registry does not know: submitted before a
+    restart, or finished by another worker process.
+
+    Returns:
+        A job record like the registry's, or None if the job is not stored.
+    """
+    if not JOB_QUEUE_DURABLE:
+        return None
+    row = DB.connect().execute("SELECT stage, state, payload, last_error, created_at, updated_at FROM jobs "
+                               "WHERE job_id = ? ORDER BY id DESC LIMIT 1", (job_id,)).fetchone()
+    if row is None:
+        return None
+    payload = json.loads(row['payload'])
+    job = {'id': job_id, 'version': 0, 'created_at': row['created_at'], 'updated_at': row['updated_at']}
+    if payload.get('original_url'):
+        job['original_url'] = payload['original_url']
+    if row['state'] == 'failed':
+        return dict(job, status='failed', error=row['last_error'] or 'Job failed.')
+    if row['state'] == 'done':
+        # A finished fetch always queues its analysis row (under the same job_id) first, so a
+        # fetch row is only the latest if nothing was queued; a finished analysis whose row is
+        # gone was deleted (e.g. by clearing the history). Neither will ever make progress.
+        if row['stage'] == 'fetch':
+            return dict(job, status='failed', error='Fetched, but no analysis was queued.')
+        result = _saved_result(payload['hash'])
+        if result is None:
+            return dict(job, status='failed', error='The analysis result is no longer stored.')
+        return dict(job, status='done', text_hash=payload['hash'], result=result)
+    return dict(job, status=STORED_STATUS.get((row['stage'], row['state']), 'queued'))
+
+def sync_stored_jobs(job_ids):
+    """Copies into the registry the final state of jobs another worker process finished.
+
+    The registry only hears about jobs finished in this process, so long polls,
+    event streams and batch responses call this when their wait runs out.
+    Updating the registry wakes every waiter on those jobs.
+
+    Returns:
+        The ids found finished.
+    """
+    job_ids = [job_id for job_id in job_ids if job_id]
+    if not JOB_QUEUE_DURABLE or not job_ids:
+        return []
+    conn = DB.connect(); candidates = []
+    for i in range(0, len(job_ids), 500): # Stays under SQLite's bound-parameter limit
+        chunk = job_ids[i:i + 500]
+        candidates += [row[0] for row in conn.execute(
+            f"SELECT DISTINCT job_id FROM jobs WHERE job_id IN ({', '.join('?' * len(chunk))}) AND state IN ('done', 'failed')", chunk)]
+    finished = []
+    for job_id in candidates:
+        stored = stored_job_status(job_id) # Its latest row decides (a done fetch row may have a queued analysis)
+        if job_registry.is_finished(stored):
+            job_registry.update(job_id, **{k: v for k, v in stored.items() if k not in ('id', 'version', 'created_at')})
+            finished.append(job_id)
+    return finished
+
+def recover_jobs():
+    """Startup: re-queues jobs a crashed process left running and re-registers every unfinished job."""
+    if not JOB_QUEUE_DURABLE:
+        return 0
+    pending = 0
+    for stage_queue in (fetch_queue, job_queue):
+        stage_queue.recover(); stage_queue.prune()
+        for job_id, state in stage_queue.unfinished():
+            if job_id:
+                job_registry.restore(job_id, status=STORED_STATUS[(stage_queue.stage, state)])
+                pending += 1
+    if pending:
+        print(f"Recovered {pending} unfinished job(s) from the durable queue.")
+    return pending
+
+def analysis_worker():
+    """Analysis stage worker: Fact Check + Gemini + verdict + save."""
+    _stage_worker(job_queue, process_job)
+
+def fetch_worker():
+    """Fetch stage worker: URL download and article extraction."""
+    _stage_worker(fetch_queue, process_fetch_job)
+
+def _start_pool(target, count, prefix, threads):
+    for i in range(count):
+        t = threading.Thread(target=target, name=f"{prefix}-{i + 1}", daemon=True)
+        t.start(); threads.append(t)
+
+def _join_pool(threads, deadline):
+    for t in threads:
+        t.join(None if deadline is None else max(0, deadline - time.monotonic()))
+    return [t.name for t in threads if t.is_alive()]
+
+def start_workers(count=None, fetch_count=None):
+    """Starts the fetch and analysis worker pools (FETCH_WORKER_COUNT / WORKER_COUNT threads by default)."""
+    count = max(1, int(count or WORKER_COUNT))
+    fetch_count = max(1, int(fetch_count or FETCH_WORKER_COUNT))
+    global GEMINI_BATCHER
+    if GEMINI_BATCH_SIZE > 1 and GEMINI_BATCHER is None:
+        GEMINI_BATCHER = MicroBatcher(lambda texts: query_gemini_batch(texts), lambda text: _query_gemini(text),
+                                      max_batch=GEMINI_BATCH_SIZE, window=GEMINI_BATCH_WINDOW, name='GeminiBatch')
+        print(f"Gemini batching enabled (up to {GEMINI_BATCH_SIZE} per call).")
+    start_result_writer()
+    _start_pool(fetch_worker, fetch_count, 'Fetcher', fetch_threads)
+    _start_pool(analysis_worker, count, 'Worker', worker_threads)
+    print(f"Started {fetch_count} fetch worker(s) and {count} analysis worker(s).")
+    return worker_threads
+
+def stop_workers(drain=True, timeout=None):
+    """Closes both stage queues and waits for workers to exit.
+
+    The fetch stage is drained first since it feeds the analysis queue.
+    With drain=True, already queued jobs are finished first; otherwise they are dropped.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    fetch_queue.close(drain=drain)
+    alive = _join_pool(fetch_threads, deadline)
+    job_queue.close(drain=drain)
+    alive += _join_pool(worker_threads, deadline)
+    if alive:
+        print(f"[Shutdown] Workers still busy after timeout: {', '.join(alive)}")
+    else:
+        fetch_threads.clear(); worker_threads.clear(); print("[Shutdown] All workers stopped.")
+    stop_result_writer(timeout=DB_WRITE_TIMEOUT) # Workers still running after this save directly
+    UPSTREAM_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    EXTRACT_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    if GEMINI_BATCHER is not None and not alive:
+        GEMINI_BATCHER.close()
+    if not alive:
+        UPSTREAM.close()
+    return not alive
+
+def enqueue_analysis(text_to_analyze, original_url=None, job_id=None, force_refresh=False):
+    """Checks the text against seen hashes and hands it to the analysis workers.
+
+    Duplicates are still queued, but their cached signals make them near-instant
+    unless force_refresh asks for a fresh Gemini verdict.
+
+    Returns:
+        The user-facing queue message.
+    """
+    job_payload, message = prepare_analysis(text_to_analyze, original_url, job_id, force_refresh)
+    job_queue.put(job_payload)
+    return message
+
+def prepare_analysis(text_to_analyze, original_url=None, job_id=None, force_refresh=False, text_hash=None):
+    """Builds an analysis job payload and marks the job queued, without putting it on the queue.
+
+    Returns:
+        (job payload, user-facing queue message)
+    """
+    text_hash = text_hash or hashlib.sha256(text_to_analyze.encode('utf-8')).hexdigest()
+
+    if already_analyzed(text_hash):
+        # queue anyway to refresh the verdict with latest logic (cached signals are reused)
+        print(f"Duplicate (Hash: {text_hash[:8]}...). Re-analyzing.")
+        message = "Re-analysis queued."
+    else:
+        print(f"New job (Hash: {text_hash[:8]}...). Queuing.")
+        message = "Analysis queued."
+
+    job_payload = {'text': text_to_analyze, 'hash': text_hash, 'job_id': job_id, 'force_refresh': force_refresh}
+    if original_url:
+        job_payload['original_url'] = original_url
+    job_registry.update(job_id, status='queued', text_hash=text_hash, analyzed_text=text_to_analyze)
+    return job_payload, message
+
+def parse_batch_body(raw):
+    """Parses a JSON array or JSONL request body into a list of entries.
+
+    Raises:
+        ValueError if the body (or a JSONL line) is not valid JSON.
+    """
+    raw = (raw or '').strip()
+    if not raw:
+        return []
+    if raw.startswith('['):
+        entries = json.loads(raw)
+        if not isinstance(entries, list):
+            raise ValueError("Expected a JSON array.")
+        return entries
+    entries = []
+    for line_no, line in enumerate(raw.splitlines(), 1):
+        if line.strip():
+            try:
+                entries.append(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f"Line {line_no}: {e}")
+    return entries
+
+def parse_batch_entry(entry):
+    """Normalizes one batch entry to (text, url, client id, force_refresh); text and url may both be None."""
+    if isinstance(entry, str):
+        entry = {'article_text': entry}
+    if not isinstance(entry, dict):
+        return None, None, None, False
+    raw_text = str(entry.get('article_text') or '').strip()
+    raw_url = str(entry.get('article_url') or '').strip()
+    force_refresh = bool(entry.get('force_refresh'))
+    if raw_url or looks_like_url(raw_text):
+        return None, normalize_url(raw_url or raw_text), entry.get('id'), force_refresh
+    return raw_text or None, None, entry.get('id'), force_refresh
+
+def already_analyzed(text_hash):
+    """True if text_hash has a saved result. The Bloom filter answers most new texts without a query."""
+    if text_hash not in seen_index:
+        return False
+    return DB.connect().execute("SELECT 1 FROM analysis_results WHERE text_hash = ?", (text_hash,)).fetchone() is not None
+
+def load_seen_index(path=None):
+    """Opens the file-backed seen-hash filter and adds the rows saved since it was last synced.
+
+    The filter records the highest analysis_results id it has seen (ids are never
+    reused), so startup reads only new rows however long the history is. A filter
+    smaller than the history is rebuilt at twice its size, into a temporary file
+    that then replaces it, so other processes mapping the old file switch over
+    instead of writing to a deleted one.
+
+    Returns:
+        The filter now in use.
+    """
+    global seen_index
+    path = path or f"{DB.path}.seen"
+    conn = DB.connect()
+    total = conn.execute("SELECT total FROM stats_counters WHERE id = 1").fetchone()[0]
+    last_id = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'analysis_results'").fetchone()[0]
+    index = BloomFilter(SEEN_INDEX_CAPACITY, SEEN_INDEX_ERROR_RATE, path=path)
+    # Rebuild if outgrown, or if the DB is older than the filter (e.g. restored from a backup)
+    if index.capacity < total or len(index) > index.capacity or index.watermark > last_id:
+        print(f"[SeenIndex] Rebuilding for {total} results (was sized for {index.capacity}).")
+        index.close()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            if os.path.exists(tmp_path): # Left by a crashed rebuild
+                os.remove(tmp_path)
+            fresh = BloomFilter(max(SEEN_INDEX_CAPACITY, 2 * total), SEEN_INDEX_ERROR_RATE, path=tmp_path)
+            for row_id, text_hash in conn.execute("SELECT id, text_hash FROM analysis_results ORDER BY id"):
+                fresh.add(text_hash); fresh.watermark = row_id
+            fresh.close()
+            BloomFilter.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        index = BloomFilter(SEEN_INDEX_CAPACITY, SEEN_INDEX_ERROR_RATE, path=path)
+    added = 0
+    for row_id, text_hash in conn.execute("SELECT id, text_hash FROM analysis_results WHERE id > ? ORDER BY id", (index.watermark,)):
+        index.add(text_hash); index.watermark = row_id; added += 1
+    index.flush()
+    seen_index = index
+    print(f"Seen-hash index: {len(index)} hashes ({added} added since last run, {index.bits // 8 // 1024} KiB).")
+    return index
+
+def _saved_result(text_hash):
+    """Returns the stored analysis row for text_hash as a dict, or None."""
+    row = DB.connect().execute("SELECT * FROM analysis_results WHERE text_hash = ?", (text_hash,)).fetchone()
+    return dict(row) if row else None
 
 # --- Flask Routes ---
+@app.teardown_appcontext
+def release_db_connections(exc=None):
+    """Returns the request thread's connections to their pools.
+
+    Flask's threaded server runs every request on a new thread, so without
+    this each request would open (and configure) fresh connections. Event
+    streams keep theirs until the thread ends, since their generators run
+    after this hook.
+    """
+    Database.release_all()
+
 @app.route('/')
 def home(): return render_template('index.html')
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
-    """Receives text/URL, validates, checks duplicates, queues."""
+    """Receives text/URL, validates, and queues it. Returns a job id right away."""
     data = request.json or {}
     raw_text = (data.get('article_text') or '').strip()
     raw_url = (data.get('article_url') or '').strip()
+    force_refresh = bool(data.get('force_refresh')) # Skip the cached Gemini verdict
 
     text_to_analyze = None
     original_url = None
@@ -448,84 +1423,346 @@ def analyze():
     if raw_url:
         original_url = normalize_url(raw_url)
         print(f"\nReceived URL: {original_url}")
-        content_result = extract_article_content(original_url)
-        if content_result.get('status') == 'success':
-            text_to_analyze = content_result['content']
-            print(f"Extracted content ({len(text_to_analyze)} chars): {text_to_analyze[:100]}...")
-        else:
-            return jsonify({"status": "error", "message": content_result.get('message', 'Failed to extract URL content')}), 400
     elif raw_text:
         # If user pasted a URL into the text box, handle it as a URL automatically
         if looks_like_url(raw_text):
             original_url = normalize_url(raw_text)
             print(f"\nDetected URL in text field: {original_url}")
-            content_result = extract_article_content(original_url)
-            if content_result.get('status') == 'success':
-                text_to_analyze = content_result['content']
-                print(f"Extracted content ({len(text_to_analyze)} chars): {text_to_analyze[:100]}...")
-            else:
-                return jsonify({"status": "error", "message": content_result.get('message', 'Failed to extract URL content')}), 400
         else:
             text_to_analyze = raw_text
             print(f"\nReceived Text: {text_to_analyze[:60]}...")
     else:
         return jsonify({"status": "error", "message": "No text or URL"}), 400
 
-    if not text_to_analyze: return jsonify({"status": "error", "message": "Analysis text missing"}), 500
+    # URLs go through the fetch stage so this request thread never waits on a download
+    if original_url:
+        job_id = job_registry.create(status='fetch_queued', original_url=original_url)
+        fetch_queue.put({'job_id': job_id, 'original_url': original_url, 'force_refresh': force_refresh})
+        return jsonify({"status": "queued", "message": "URL fetch queued.", "job_id": job_id})
+
+    job_id = job_registry.create(status='queued')
+    message = enqueue_analysis(text_to_analyze, job_id=job_id, force_refresh=force_refresh)
+    return jsonify({"status": "queued", "message": message, "analyzed_text": text_to_analyze, "job_id": job_id})
 
-    text_hash = hashlib.sha256(text_to_analyze.encode('utf-8')).hexdigest()
+@app.route('/api/analyze_batch', methods=['POST'])
+def analyze_batch():
+    """Queues many texts/URLs at once and streams their verdicts back as JSONL.
 
-    if text_hash in seen_hashes:
-        print(f"Duplicate (Hash: {text_hash[:8]}...). Re-analyzing.")
-        # queue anyway to refresh the verdict with latest logic
-        job_payload = {'text': text_to_analyze, 'hash': text_hash}
-        if original_url:
-            job_payload['original_url'] = original_url
-        job_queue.append(job_payload)
-        return jsonify({"status": "queued", "message": "Re-analysis queued.", "analyzed_text": text_to_analyze})
-
-    print(f"New job (Hash: {text_hash[:8]}...). Queuing.")
-    seen_hashes.add(text_hash)
-    job_payload = {'text': text_to_analyze, 'hash': text_hash}
-    if original_url:
-        job_payload['original_url'] = original_url
-    job_queue.append(job_payload)
+    The body is a JSON array or JSONL; each entry is a string or an object with
+    article_text or article_url (plus optional id and force_refresh). Entries
+    repeated within the batch share one job, and texts already analyzed are
+    answered from the database without being queued again.
+
+    The response streams one line per entry as soon as its job finishes, after
+    an opening "accepted" line with the counts.
+    """
+    try:
+        entries = parse_batch_body(request.get_data(as_text=True))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid batch body: {e}"}), 400
+    if not entries:
+        return jsonify({"status": "error", "message": "Empty batch"}), 400
+    if len(entries) > BATCH_MAX_ITEMS:
+        return jsonify({"status": "error", "message": f"Batch too large (max {BATCH_MAX_ITEMS} entries)"}), 413
+
+    immediate = [] # Lines that can be sent right away (invalid entries, already-analyzed texts)
+    pending = {} # job_id -> [(index, client id)]
+    by_key = {} # Dedup key -> job_id, or the ready line for already-analyzed texts
+    fetch_jobs, analysis_jobs = [], []
+    for index, entry in enumerate(entries):
+        text, url, client_id, force_refresh = parse_batch_entry(entry)
+        if not text and not url:
+            immediate.append({"index": index, "id": client_id, "status": "error", "message": "No text or URL"})
+            continue
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest() if text else None
+        key = ('url', canonical_url(url)) if url else ('text', text_hash)
+        if key not in by_key:
+            saved = _saved_result(text_hash) if text and not force_refresh and text_hash in seen_index else None
+            if saved:
+                by_key[key] = {"status": "done", "duplicate": True, "result": saved}
+            elif url:
+                by_key[key] = job_registry.create(status='fetch_queued', original_url=url)
+                fetch_jobs.append({'job_id': by_key[key], 'original_url': url, 'force_refresh': force_refresh})
+            else:
+                by_key[key] = job_registry.create(status='queued')
+                analysis_jobs.append(prepare_analysis(text, job_id=by_key[key], force_refresh=force_refresh, text_hash=text_hash)[0])
+        if isinstance(by_key[key], dict):
+            immediate.append(dict(by_key[key], index=index, id=client_id))
+        else:
+            pending.setdefault(by_key[key], []).append((index, client_id))
+    # Watched from before they can finish, so none is evicted before the stream reports it
+    watch = job_registry.watch(pending)
+    try:
+        if fetch_jobs:
+            fetch_queue.put_many(fetch_jobs)
+        if analysis_jobs:
+            job_queue.put_many(analysis_jobs)
+    except RuntimeError:
+        watch.close()
+        return jsonify({"status": "error", "message": "Server is shutting down."}), 503
+    print(f"[Batch] {len(entries)} entries: {len(fetch_jobs)} URL jobs, {len(analysis_jobs)} text jobs, {len(immediate)} answered directly.")
+
+    def lines():
+        yield json.dumps({"event": "accepted", "total": len(entries), "queued": len(pending),
+                          "answered": len(immediate)}) + "\n"
+        for line in immediate:
+            yield json.dumps(dict(line, event="result")) + "\n"
+        deadline = time.monotonic() + BATCH_STREAM_TIMEOUT
+        next_sync = time.monotonic() + SSE_KEEPALIVE
+        while pending:
+            now = time.monotonic(); remaining = deadline - now
+            if remaining <= 0:
+                break
+            if now >= next_sync: # Jobs finished by another worker process only show up in the jobs table
+                sync_stored_jobs(list(pending)); next_sync = now + SSE_KEEPALIVE
+            for job_id, job in watch.get(timeout=min(remaining, next_sync - now)):
+                if job is None:
+                    line = {"job_id": job_id, "status": "failed", "error": "Job is no longer tracked."}
+                elif job['status'] == 'done':
+                    line = {"job_id": job_id, "status": "done", "result": job.get('result')}
+                else:
+                    line = {"job_id": job_id, "status": "failed", "error": job.get('error')}
+                for index, client_id in pending.pop(job_id):
+                    yield json.dumps(dict(line, event="result", index=index, id=client_id)) + "\n"
+        # Stragglers can still be fetched with /api/jobs/<job_id>
+        for job_id, refs in pending.items():
+            for index, client_id in refs:
+                yield json.dumps({"event": "result", "index": index, "id": client_id, "job_id": job_id, "status": "timeout"}) + "\n"
+
+    response = Response(stream_with_context(lines()), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(watch.close) # Also runs if the client leaves before the stream starts
+    return response
+
+@app.route('/api/cache_stats')
+def get_cache_stats():
+    """Gets hit/miss/eviction counters for the upstream response caches."""
+    return jsonify({"fact_check": FACT_CHECK_CACHE.stats(), "gemini": GEMINI_CACHE.stats(), "articles": ARTICLE_CACHE.stats(),
+                    "seen_index": seen_index.stats(), "claims": CLAIM_INDEX.stats() if CLAIM_INDEX is not None else None,
+                    "db_connections": DB.stats()})
+
+@app.route('/api/upstream_stats')
+def get_upstream_stats():
+    """Gets per-host request counts and latency percentiles for upstream APIs."""
+    stats = UPSTREAM.stats()
+    stats['domain_reputation'] = DOMAIN_REPUTATION.stats()
+    if GEMINI_BATCHER is not None:
+        stats['gemini_batching'] = GEMINI_BATCHER.stats()
+    return jsonify(stats)
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Gets the status (and, once done, the result) of one job.
+
+    With ?wait=<seconds>, long-polls: the response is held until the job
+    finishes or the wait expires (capped at LONG_POLL_MAX seconds).
+    """
+    try:
+        wait_s = min(max(float(request.args.get('wait', 0)), 0.0), LONG_POLL_MAX)
+    except ValueError:
+        wait_s = 0.0
+    job = job_registry.get(job_id)
+    if job is None:
+        job = stored_job_status(job_id)
+        if job is None:
+            return jsonify({"status": "error", "message": "Job not found."}), 404
+        return jsonify(job)
+    deadline = time.monotonic() + wait_s
+    while not job_registry.is_finished(job) and time.monotonic() < deadline:
+        job = job_registry.wait(job_id, job['version'], deadline - time.monotonic())
+        if job is None:
+            return jsonify({"status": "error", "message": "Job not found."}), 404
+    if not job_registry.is_finished(job) and sync_stored_jobs([job_id]): # Finished by another worker process
+        job = job_registry.get(job_id) or job
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/events')
+def stream_job(job_id):
+    """Server-Sent Events stream of one job's status changes, ending with its result."""
+    if job_registry.get(job_id) is None:
+        stored = stored_job_status(job_id) # Submitted before a restart, or through another process
+        if stored is None:
+            return jsonify({"status": "error", "message": "Job not found."}), 404
+        job_registry.restore(job_id, **{k: v for k, v in stored.items() if k not in ('id', 'version')})
 
-    return jsonify({"status": "queued", "message": "Analysis queued.", "analyzed_text": text_to_analyze})
+    def events():
+        version = 0
+        while True:
+            job = job_registry.wait(job_id, version, SSE_KEEPALIVE)
+            if job is None:
+                yield "event: error\ndata: {\"message\": \"Job not found.\"}\n\n"; return
+            if job['version'] == version:
+                # Nothing changed here; the job may have been finished by another worker process
+                if not sync_stored_jobs([job_id]):
+                    yield ": keep-alive\n\n" # Comment line keeps proxies from closing the stream
+                continue
+            version = job['version']
+            finished = job_registry.is_finished(job)
+            yield f"event: {job['status'] if finished else 'status'}\ndata: {json.dumps(job)}\n\n"
+            if finished:
+                return
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def read_stats():
+    """Reads the trigger-maintained counters row (briefly cached in memory)."""
+    stats = STATS_CACHE.get('stats')
+    if stats is None:
+        row = DB.connect().execute("SELECT total, verified_true, flagged_false, version FROM stats_counters WHERE id = 1").fetchone()
+        stats = dict(row) if row else {"total": 0, "verified_true": 0, "flagged_false": 0, "version": 0}
+        STATS_CACHE.set('stats', stats)
+    return stats
 
 @app.route('/api/stats')
 def get_stats():
-    """Gets aggregate stats (uses final_verdict column)."""
+    """Gets aggregate stats (uses final_verdict column) from the counters row.
+
+    Carries an ETag of the counters' version, so unchanged stats answer 304.
+    """
     try:
-        conn = sqlite3.connect(DB_FILE); conn.row_factory = sqlite3.Row; cursor = conn.cursor()
-        tq = cursor.execute("SELECT COUNT(*) AS total FROM analysis_results").fetchone(); total = tq['total'] if tq else 0
-        
-        # Count based on FINAL VERDICT column
-        false_c_q = cursor.execute("SELECT COUNT(*) AS total FROM analysis_results WHERE final_verdict = 'FLAGGED_FALSE'").fetchone()
-        false_c = false_c_q['total'] if false_c_q else 0
-        
-        true_c_q = cursor.execute("SELECT COUNT(*) AS total FROM analysis_results WHERE final_verdict = 'VERIFIED_TRUE'").fetchone()
-        true_c = true_c_q['total'] if true_c_q else 0
-        
-        conn.close(); return jsonify({"total_analyzed": total, "verified_true": true_c, "flagged_false": false_c})
+        stats = read_stats()
+        response = jsonify({"total_analyzed": stats['total'], "verified_true": stats['verified_true'], "flagged_false": stats['flagged_false']})
+        response.set_etag(f"stats-{stats['version']}")
+        response.headers['Cache-Control'] = 'no-cache' # Always revalidate; a 304 costs no body
+        return response.make_conditional(request)
     except Exception as e: print(f"[Stats Error] {e}"); return jsonify({"error": str(e)}), 500
 
+# Columns shipped in history lists; the full text and reasoning come from /api/history/<id>
+HISTORY_LIST_COLUMNS = ('{t}id, {t}timestamp, substr({t}query_text, 1, {preview}) AS query_preview, length({t}query_text) AS query_length, '
+                        '{t}rating, {t}publisher, {t}merkle_root_hash, {t}original_url, {t}domain, {t}gemini_flag, '
+                        '{t}gemini_confidence, {t}final_verdict')
+HISTORY_VERDICTS = ('VERIFIED_TRUE', 'FLAGGED_FALSE')
+
+def _iso_param(name):
+    """Reads an ISO date/datetime query parameter. Raises ValueError if malformed."""
+    value = (request.args.get(name) or '').strip()
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value).isoformat()
+
+def _history_filters(t=''):
+    """Builds WHERE clauses for the verdict/domain/since/until query parameters.
+
+    Args:
+        t: Table prefix (e.g. 'r.') for queries that join analysis_results.
+
+    Raises:
+        ValueError if a date parameter is malformed.
+    """
+    since, until = _iso_param('since'), _iso_param('until')
+    where, params = [], []
+    verdict = (request.args.get('verdict') or '').strip().upper()
+    if verdict in HISTORY_VERDICTS:
+        where.append(f"{t}final_verdict = ?"); params.append(verdict)
+    elif verdict == 'INCONCLUSIVE':
+        where.append(f"({t}final_verdict IS NULL OR {t}final_verdict NOT IN (?, ?))"); params.extend(HISTORY_VERDICTS)
+    domain = (request.args.get('domain') or '').strip().lower()
+    if domain:
+        where.append(f"{t}domain = ?"); params.append(domain[4:] if domain.startswith('www.') else domain)
+    if since:
+        where.append(f"{t}timestamp >= ?"); params.append(since)
+    if until:
+        where.append(f"{t}timestamp < ?"); params.append(until)
+    return where, params
+
 @app.route('/api/history')
 def get_history():
-    """Gets all results for history page."""
+    """Gets one page of results for the history page, newest first.
+
+    Query parameters:
+        before_id: Keyset cursor; only rows with a smaller id are returned.
+        limit: Page size (default HISTORY_PAGE_SIZE, capped at HISTORY_MAX_PAGE_SIZE).
+        verdict: VERIFIED_TRUE, FLAGGED_FALSE or INCONCLUSIVE (anything else).
+        domain: Exact domain (a leading www. is ignored).
+        since / until: ISO dates bounding the analysis timestamp (until is exclusive).
+
+    Returns:
+        {"items": [...], "next_before_id": cursor for the next page or null}
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+        before_id = request.args.get('before_id', type=int)
+        where, params = _history_filters()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid parameter: {e}"}), 400
+    if before_id is not None:
+        where.insert(0, "id < ?"); params.insert(0, before_id)
+    sql = (f"SELECT {HISTORY_LIST_COLUMNS.format(t='', preview=int(HISTORY_PREVIEW_CHARS))} FROM analysis_results"
+           f"{' WHERE ' + ' AND '.join(where) if where else ''} ORDER BY id DESC LIMIT ?")
+    try:
+        rows = DB.connect().execute(sql, params + [limit + 1]).fetchall() # One extra row tells us if there is a next page
+    except Exception as e: print(f"[History Error] {e}"); return jsonify({"error": str(e)}), 500
+    items = [dict(row) for row in rows[:limit]]
+    return jsonify({"items": items, "next_before_id": items[-1]['id'] if len(rows) > limit else None})
+
+def fts_query(text):
+    """Turns free text into a safe FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    return ' '.join(f'"{w}"' for w in words[:-1]) + (' ' if len(words) > 1 else '') + f'"{words[-1]}"*'
+
+@app.route('/api/search')
+def search_history():
+    """Full-text search over analyzed claims, their Gemini reasoning and publishers.
+
+    Query parameters:
+        q: Search text (all words must match; the last word may be a prefix).
+        limit / offset: Page of the ranked results (default SEARCH_PAGE_SIZE).
+        verdict, domain, since, until: Same filters as /api/history.
+
+    Returns:
+        {"items": [...], "next_offset": offset for the next page or null}, best
+        (bm25) matches first, each with query_snippet/reasoning_snippet where
+        matched terms are wrapped in <mark></mark>.
+    """
+    match = fts_query(request.args.get('q'))
+    if not match:
+        return jsonify({"status": "error", "message": "Missing search text"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', SEARCH_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        where, params = _history_filters('r.')
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid parameter: {e}"}), 400
+    columns = HISTORY_LIST_COLUMNS.format(t='r.', preview=int(HISTORY_PREVIEW_CHARS))
+    if search_index_available():
+        sql = (f"SELECT {columns}, snippet(analysis_fts, 0, '<mark>', '</mark>', '...', 24) AS query_snippet, "
+               f"snippet(analysis_fts, 1, '<mark>', '</mark>', '...', 16) AS reasoning_snippet "
+               f"FROM analysis_fts JOIN analysis_results r ON r.id = analysis_fts.rowid "
+               f"WHERE analysis_fts MATCH ?{''.join(' AND ' + w for w in where)} "
+               f"ORDER BY bm25(analysis_fts, {SEARCH_WEIGHTS}) LIMIT ? OFFSET ?")
+        params = [match] + params
+    else: # SQLite built without FTS5: unranked substring match, newest first
+        like = '%' + ' '.join(re.findall(r'\w+', request.args.get('q'))) + '%'
+        sql = (f"SELECT {columns}, NULL AS query_snippet, NULL AS reasoning_snippet FROM analysis_results r "
+               f"WHERE (r.query_text LIKE ? OR r.gemini_reasoning LIKE ? OR r.publisher LIKE ?)"
+               f"{''.join(' AND ' + w for w in where)} ORDER BY r.id DESC LIMIT ? OFFSET ?")
+        params = [like, like, like] + params
+    start = time.perf_counter()
+    try:
+        rows = DB.connect().execute(sql, params + [limit + 1, offset]).fetchall()
+    except Exception as e: print(f"[Search Error] {e}"); return jsonify({"error": str(e)}), 500
+    items = [dict(row) for row in rows[:limit]]
+    return jsonify({"items": items, "next_offset": offset + limit if len(rows) > limit else None,
+                    "took_ms": round((time.perf_counter() - start) * 1000, 1)})
+
+@app.route('/api/history/<int:item_id>')
+def get_history_item(item_id):
+    """Gets the full stored result for one history item."""
     try:
-        conn = sqlite3.connect(DB_FILE); conn.row_factory = sqlite3.Row; cursor = conn.cursor()
-        results = cursor.execute("SELECT * FROM analysis_results ORDER BY id DESC").fetchall()
-        conn.close(); history_list = [dict(row) for row in results]; return jsonify(history_list)
+        row = DB.connect().execute("SELECT * FROM analysis_results WHERE id = ?", (item_id,)).fetchone()
     except Exception as e: print(f"[History Error] {e}"); return jsonify({"error": str(e)}), 500
+    if row is None:
+        return jsonify({"status": "error", "message": "Item not found."}), 404
+    return jsonify(dict(row))
 
 @app.route('/api/latest_result')
 def get_latest_result():
     """Gets the most recent result."""
     try:
-        conn = sqlite3.connect(DB_FILE); conn.row_factory = sqlite3.Row; cursor = conn.cursor()
-        latest = cursor.execute("SELECT * FROM analysis_results ORDER BY id DESC LIMIT 1").fetchone()
-        conn.close()
+        latest = DB.connect().execute("SELECT * FROM analysis_results ORDER BY id DESC LIMIT 1").fetchone()
         if latest: return jsonify(dict(latest))
         else: return jsonify({"status": "empty", "message": "No results yet."})
     except Exception as e: print(f"[Latest Error] {e}"); return jsonify({"error": str(e)}), 500
@@ -535,25 +1772,19 @@ def delete_history_item(item_id):
     """Deletes a specific analysis result by ID."""
     print(f"[Delete Request] Item ID: {item_id}")
     try:
-        conn = sqlite3.connect(DB_FILE); cursor = conn.cursor()
-        # Get the text_hash before deleting so we can remove it from seen_hashes
-        result = cursor.execute("SELECT text_hash FROM analysis_results WHERE id = ?", (item_id,)).fetchone()
+        with DB.transaction() as conn:
+            result = conn.execute("SELECT text_hash FROM analysis_results WHERE id = ?", (item_id,)).fetchone()
+            if result:
+                conn.execute("DELETE FROM analysis_results WHERE id = ?", (item_id,))
+        STATS_CACHE.clear()
         if result:
             text_hash = result[0]
+            # Bloom filters cannot forget a key; the hash stays in seen_index, but
+            # already_analyzed() confirms hits against the DB, so it counts as new again
             print(f"[Delete] Found item with hash: {text_hash[:8]}...")
-            cursor.execute("DELETE FROM analysis_results WHERE id = ?", (item_id,))
-            conn.commit()
-            # Remove from seen_hashes to allow re-analysis if needed
-            try:
-                seen_hashes.discard(text_hash)
-                print(f"[Delete] Removed hash from seen_hashes")
-            except Exception as e:
-                print(f"[Delete] Warning: Could not remove from seen_hashes: {e}")
-            conn.close()
             print(f"[Delete] Successfully deleted item {item_id}")
             return jsonify({"status": "success", "message": "Item deleted."})
         else:
-            conn.close()
             print(f"[Delete] Item {item_id} not found in database")
             return jsonify({"status": "error", "message": "Item not found."}), 404
     except Exception as e:
@@ -566,14 +1797,10 @@ def delete_history_item(item_id):
 def clear_history():
     """Clears all saved analysis results and resets duplicate tracking."""
     try:
-        conn = sqlite3.connect(DB_FILE); cursor = conn.cursor()
-        cursor.execute("DELETE FROM analysis_results")
-        conn.commit(); conn.close()
-        # Reset in-memory hashes so re-analysis will enqueue
-        try:
-            seen_hashes.clear()
-        except Exception:
-            pass
+        with DB.transaction() as conn:
+            conn.execute("DELETE FROM analysis_results")
+        STATS_CACHE.clear()
+        seen_index.clear() # So the next submissions skip the DB check again
         return jsonify({"status": "success", "message": "History cleared."})
     except Exception as e:
         print(f"[Clear History Error] {e}")
@@ -582,15 +1809,23 @@ def clear_history():
 # --- Start Server ---
 if __name__ == '__main__':
     init_database()
-    try: # Load existing hashes on startup
-        conn = sqlite3.connect(DB_FILE); cursor = conn.cursor()
-        hashes_in_db = cursor.execute("SELECT text_hash FROM analysis_results").fetchall()
-        seen_hashes.update([row[0] for row in hashes_in_db])
-        conn.close()
-        print(f"Loaded {len(seen_hashes)} existing hashes from DB.")
-    except Exception as e: print(f"[Startup Error] DB hash load failed: {e}")
-
-    worker_thread = threading.Thread(target=analysis_worker, daemon=True)
-    worker_thread.start()
-    print("\nStarting Flask server on port 5001...")
-    app.run(debug=True, port=5001, use_reloader=False)
\ No newline at end of file
+    try: # Map the duplicate filter and catch it up with rows saved since the last run
+        load_seen_index()
+    except Exception as e: print(f"[Startup Error] Seen-hash index load failed: {e}")
+
+    recover_jobs()
+    start_near_dup_backfill()
+    start_workers()
+    try:
+        if '--worker' in sys.argv[1:]: # Extra worker process sharing the durable queues; no web server
+            print("\nRunning as a worker process; press Ctrl+C to stop.")
+            threading.Event().wait()
+        else:
+            print("\nStarting Flask server on port 5001...")
+            app.run(debug=True, port=5001, use_reloader=False)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\n[Shutdown] Draining job queue...")
+        stop_workers(drain=True, timeout=SHUTDOWN_TIMEOUT)
+        seen_index.close()
\ No newline at end of file
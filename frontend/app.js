@@ -128,6 +128,8 @@ const FALSE_RATINGS_JS = ['false', 'pants on fire', 'mostly false', 'scam', 'fak
     subtext.innerHTML = `
         FC Rating: <strong>${actualRating}</strong> by ${actualPublisher}. 
         <br>AI Reason: <em>${geminiReason || 'N/A (AI analysis unavailable)'}</em>
+        ${resultData.missing_signals ? `<br>Missing signals (timed out): <strong>${resultData.missing_signals}</strong>` : ''}
+        ${resultData.duplicate_of ? `<br>Near-duplicate of analysis #${resultData.duplicate_of}${resultData.similarity ? ` (${Math.round(resultData.similarity * 100)}% similar)` : ''}; its signals were reused.` : ''}
     `;
 
     // --- Update Confidence Score ---
@@ -197,7 +199,7 @@ document.addEventListener("DOMContentLoaded", function() {
             if (data.status === 'queued') {
                 alert(`Analysis for ${snippet} queued! Result will appear below.`);
                 if (currentInputMode === 'text') articleTextarea.value = ""; else articleUrlInput.value = "";
-                pollForResult(lastAnalyzedText); // Start polling
+                watchJob(data.job_id); // Wait for the server to push this job's result
             } else if (data.status === 'duplicate') {
                 alert(`${snippet} already analyzed. Result shown below.`);
                 fetchAndDisplayLatestResult(lastAnalyzedText); // Show existing result
@@ -259,31 +261,49 @@ document.addEventListener("DOMContentLoaded", function() {
         .catch(error => { console.error("Error fetching latest result:", error); resultsSection.style.display = 'none'; });
     }
     
-    // --- Polling function for new results (No change) ---
-    function pollForResult(textToMatch, attempts = 0) {
-        if (!textToMatch) return;
-        const maxAttempts = 5;
-        const delay = 3000;
+    // --- Job result delivery: SSE stream, falling back to long-polling ---
+    function handleFinishedJob(job) {
+        if (job.status === 'done' && job.result) {
+            console.log("Result received:", job.result);
+            displayAnalysisResult(job.result);
+        } else {
+            console.log("Job failed:", job.error);
+            alert("Error: " + (job.error || 'Analysis failed.'));
+            resultsSection.style.display = 'none';
+        }
+    }
+
+    function watchJob(jobId) {
+        if (!jobId) return;
+        if (!window.EventSource) { longPollJob(jobId); return; }
+        const source = new EventSource(`/api/jobs/${jobId}/events`);
+        let finished = false;
+        source.addEventListener('status', (e) => console.log(`Job is ${JSON.parse(e.data).status}...`));
+        ['done', 'failed'].forEach(name => source.addEventListener(name, (e) => {
+            finished = true; source.close(); handleFinishedJob(JSON.parse(e.data));
+        }));
+        source.onerror = () => {
+            if (finished) return;
+            console.log("Event stream dropped, switching to long-polling.");
+            source.close(); longPollJob(jobId);
+        };
+    }
+
+    function longPollJob(jobId, attempts = 0) {
+        const maxAttempts = 10; // Each attempt is held open by the server for up to 25s
         if (attempts >= maxAttempts) {
-            console.log("Polling timed out.");
+            console.log("Long-polling timed out.");
             alert("Analysis is taking longer than expected. Check the History page later.");
             resultsSection.style.display = 'none';
             return;
         }
-
-        console.log(`Polling for result attempt ${attempts + 1}...`);
-        fetch('/api/latest_result')
+        fetch(`/api/jobs/${jobId}?wait=25`)
         .then(response => response.ok ? response.json() : Promise.reject('Failed to fetch'))
-        .then(latestResultData => {
-            if (latestResultData && latestResultData.query_text === textToMatch) {
-                console.log("Polling successful! Result found:", latestResultData);
-                displayAnalysisResult(latestResultData); // Found it! Display.
-            } else {
-                console.log("Result not ready yet, polling again...");
-                setTimeout(() => pollForResult(textToMatch, attempts + 1), delay);
-            }
+        .then(job => {
+            if (job.status === 'done' || job.status === 'failed') handleFinishedJob(job);
+            else longPollJob(jobId, attempts + 1);
         })
-        .catch(error => { console.error("Error during polling:", error); });
+        .catch(error => { console.error("Error during long-polling:", error); });
     }
 
 
@@ -3,7 +3,18 @@ document.addEventListener("DOMContentLoaded", function() {
     const historyList = document.getElementById("history-list");
     const searchInput = document.getElementById("search-input");
     const statusFilter = document.getElementById("status-filter");
-    let allHistoryData = []; // Store all data to allow filtering without re-fetching
+    const PAGE_SIZE = 50;
+    const STATUS_TO_VERDICT = { 'true': 'VERIFIED_TRUE', 'false': 'FLAGGED_FALSE', 'not-found': 'INCONCLUSIVE' };
+    let loadedItems = []; // Pages fetched so far for the current status filter and search text
+    let nextCursor = null; // before_id (browsing) or offset (searching) of the next page, null when there are no more
+    let searchTimer = null;
+    let loading = false;
+    let requestSeq = 0;
+
+    const loadMoreButton = document.createElement('button');
+    loadMoreButton.id = 'load-more-button'; loadMoreButton.className = 'export-btn'; loadMoreButton.textContent = 'Load more';
+    loadMoreButton.style.display = 'none'; loadMoreButton.style.margin = '16px auto';
+    historyList.insertAdjacentElement('afterend', loadMoreButton);
 
     // --- Constants for ratings ---
     const FALSE_RATINGS_JS = ['false', 'pants on fire', 'mostly false', 'scam', 'fake', 'misleading'];
@@ -12,6 +23,11 @@ document.addEventListener("DOMContentLoaded", function() {
     // --- Helper functions ---
     function isFalseRating(rating) { return rating && FALSE_RATINGS_JS.includes(rating.toLowerCase()); }
     function isTrueRating(rating) { return rating && TRUE_RATINGS_JS.includes(rating.toLowerCase()); }
+    // Search snippets: escape the text, then restore the server's <mark> highlights
+    function highlight(snippet) {
+        const div = document.createElement('div'); div.textContent = snippet;
+        return div.innerHTML.replace(/&lt;mark&gt;/g, '<mark>').replace(/&lt;\/mark&gt;/g, '</mark>');
+    }
 
     // --- Function to render the history list based on filters ---
     function renderHistory(dataToRender) {
@@ -80,7 +96,9 @@ document.addEventListener("DOMContentLoaded", function() {
                         </svg>
                     </button>
                 </div>
-                <h3>${item.query_text || 'N/A'}</h3>
+                <h3 class="history-title" data-id="${item.id}" title="Show full analysis" style="cursor: pointer;">${item.query_snippet ? highlight(item.query_snippet) : `${item.query_preview || 'N/A'}${item.query_length > (item.query_preview || '').length ? '...' : ''}`}</h3>
+                ${item.reasoning_snippet && item.reasoning_snippet.includes('<mark>') ? `<p class="details">AI reasoning: ${highlight(item.reasoning_snippet)}</p>` : ''}
+                <div class="history-detail" style="display: none;"></div>
                 <p class="details">Publisher: ${item.publisher || 'N/A'} | Analyzed: ${formattedDate}</p>
                 <p class="details">Domain: ${item.domain || 'N/A'} | URL: ${item.original_url ? `<a href="${item.original_url}" target="_blank" rel="noopener noreferrer">Link</a>` : 'N/A'}</p>
                 <p class="hash">Merkle Hash: ${shortHash}${item.merkle_root_hash ? '...' : ''}</p>
@@ -90,40 +108,64 @@ document.addEventListener("DOMContentLoaded", function() {
     }
 
     function applyFilters() {
-        // ... (applyFilters logic remains the same) ...
-        const searchTerm = searchInput.value.toLowerCase();
-        const statusValue = statusFilter.value;
-        const filteredData = allHistoryData.filter(item => {
-            const textMatch = (item.query_text || '').toLowerCase().includes(searchTerm);
-            const verdict = item.final_verdict || '';
-            const ratingLower = (item.rating || '').toLowerCase();
-            let statusMatch = true;
-            if (statusValue === 'true') {
-                statusMatch = verdict === 'VERIFIED_TRUE' || isTrueRating(ratingLower);
-            } else if (statusValue === 'false') {
-                statusMatch = verdict === 'FLAGGED_FALSE' || isFalseRating(ratingLower);
-            } else if (statusValue === 'not-found') {
-                statusMatch = !(verdict === 'VERIFIED_TRUE' || verdict === 'FLAGGED_FALSE' || isTrueRating(ratingLower) || isFalseRating(ratingLower));
-            }
-            return textMatch && statusMatch;
-        });
-        renderHistory(filteredData);
+        // Status and search text are both applied by the server
+        renderHistory(loadedItems);
+        loadMoreButton.style.display = nextCursor !== null ? 'block' : 'none';
     }
 
-    function loadHistory() {
-        // ... (loadHistory logic remains the same) ...
-        console.log("Fetching history..."); historyList.innerHTML = "<p>Loading...</p>";
-        fetch('/api/history')
+    // Browsing pages with /api/history (before_id cursor); searching pages with /api/search (ranked, offset cursor)
+    function loadHistory(reset = true) {
+        if (loading && !reset) return;
+        loading = true;
+        const seq = ++requestSeq; // Only the latest request may render (typing fires several)
+        const searchTerm = searchInput.value.trim();
+        const params = new URLSearchParams({ limit: PAGE_SIZE });
+        const verdict = STATUS_TO_VERDICT[statusFilter.value];
+        if (verdict) params.set('verdict', verdict);
+        if (searchTerm) params.set('q', searchTerm);
+        if (!reset && nextCursor !== null) params.set(searchTerm ? 'offset' : 'before_id', nextCursor);
+        if (reset) { console.log("Fetching history..."); historyList.innerHTML = "<p>Loading...</p>"; }
+        loadMoreButton.disabled = true;
+        fetch(`${searchTerm ? '/api/search' : '/api/history'}?${params}`)
             .then(response => response.ok ? response.json() : Promise.reject(`HTTP error ${response.status}`))
             .then(data => {
-                if (!Array.isArray(data)) throw new Error("Invalid data format.");
-                allHistoryData = data; applyFilters();
+                if (seq !== requestSeq) return;
+                if (!data || !Array.isArray(data.items)) throw new Error("Invalid data format.");
+                loadedItems = reset ? data.items : loadedItems.concat(data.items);
+                nextCursor = searchTerm ? data.next_offset : data.next_before_id;
+                applyFilters();
             })
-            .catch(error => { console.error("Error loading history:", error); historyList.innerHTML = `<p>Error: ${error}.</p>`; });
+            .catch(error => { console.error("Error loading history:", error); historyList.innerHTML = `<p>Error: ${error}.</p>`; })
+            .finally(() => { if (seq === requestSeq) { loading = false; loadMoreButton.disabled = false; } });
+    }
+
+    // --- Full text and AI reasoning, fetched on demand ---
+    function toggleDetail(title) {
+        const detail = title.nextElementSibling;
+        if (detail.style.display !== 'none') { detail.style.display = 'none'; return; }
+        detail.style.display = 'block';
+        if (detail.dataset.loaded) return;
+        detail.innerHTML = '<p class="details">Loading...</p>';
+        fetch(`/api/history/${title.getAttribute('data-id')}`)
+            .then(resp => resp.ok ? resp.json() : Promise.reject(`HTTP error ${resp.status}`))
+            .then(item => {
+                detail.dataset.loaded = '1';
+                detail.innerHTML = '';
+                const text = document.createElement('p'); text.className = 'details'; text.textContent = item.query_text || '';
+                detail.appendChild(text);
+                if (item.gemini_reasoning) {
+                    const reasoning = document.createElement('p'); reasoning.className = 'details';
+                    reasoning.textContent = `AI reasoning: ${item.gemini_reasoning}`;
+                    detail.appendChild(reasoning);
+                }
+            })
+            .catch(err => { detail.innerHTML = `<p class="details">Error: ${err}.</p>`; });
     }
 
     // --- Delete handler with event delegation ---
     historyList.addEventListener('click', (event) => {
+        const title = event.target.closest('.history-title');
+        if (title) { toggleDetail(title); return; }
         const deleteBtn = event.target.closest('.delete-btn');
         if (deleteBtn) {
             const itemId = deleteBtn.getAttribute('data-id');
@@ -146,7 +188,7 @@ document.addEventListener("DOMContentLoaded", function() {
                 .then((data) => {
                     console.log('Delete successful:', data);
                     // Remove from local data and re-render
-                    allHistoryData = allHistoryData.filter(item => item.id != itemId);
+                    loadedItems = loadedItems.filter(item => item.id != itemId);
                     applyFilters();
                 })
                 .catch(err => {
@@ -157,8 +199,12 @@ document.addEventListener("DOMContentLoaded", function() {
     });
 
     // --- Event Listeners and Initial Load (Same as before) ---
-    searchInput.addEventListener('input', applyFilters);
-    statusFilter.addEventListener('change', applyFilters);
+    searchInput.addEventListener('input', () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => loadHistory(true), 250); // Wait for a pause in typing
+    });
+    statusFilter.addEventListener('change', () => loadHistory(true));
+    loadMoreButton.addEventListener('click', () => loadHistory(false));
     // Export button listener (same as before)
     const exportButton = document.getElementById('export-button');
     if (exportButton) { exportButton.addEventListener('click', () => { /* ... export logic ... */ }); }
@@ -170,7 +216,7 @@ document.addEventListener("DOMContentLoaded", function() {
             if (!confirm('This will remove all saved analyses. Continue?')) return;
             fetch('/api/clear_history', { method: 'POST' })
                 .then(resp => resp.ok ? resp.json() : resp.json().then(e => Promise.reject(e)))
-                .then(() => { allHistoryData = []; historyList.innerHTML = '<p>History cleared.</p>'; })
+                .then(() => { loadedItems = []; nextCursor = null; applyFilters(); historyList.innerHTML = '<p>History cleared.</p>'; })
                 .catch(err => { console.error('Failed to clear history', err); alert('Failed to clear history'); });
         });
     }